@@ -1,4 +1,5 @@
 from enum import Enum
+import io
 import math
 from scipy.stats import truncnorm
 from scipy.stats import binom
@@ -49,11 +50,19 @@ class DataDescriptor:
         """Get number of specialties."""
         return self._specialties
 
+    @specialties.setter
+    def specialties(self, value):
+        self._specialties = value
+
     @property
     def operatingRooms(self):
         """Get number of operating rooms."""
         return self._operatingRooms
 
+    @operatingRooms.setter
+    def operatingRooms(self, value):
+        self._operatingRooms = value
+
     @property
     def days(self):
         """Get number of days in the planning horizon."""
@@ -171,32 +180,142 @@ Distributions for operating times and priorities are Truncated Normal Distributi
 
 
 class DataContainer:
+    """The drawn sample, one array per patient attribute (patient i at position i - 1). Surgeries and UOs
+    are integer codes into DataMaker.surgeryIds and DataMaker.UOIds: labels are only looked up for output."""
+
     def __init__(self, operatingRoomTimes, anesthetistsTimes, operatingTimes, surgeriyIds, UOIds, priorities, anesthesiaFlags, covidFlags, specialties):
         self.operatingRoomTimes = operatingRoomTimes
         self.anesthetistsTimes = None
-        self.operatingTimes = self.sample_list_to_dict(operatingTimes)
-        self.surgeriyIds = self.sample_list_to_dict(surgeriyIds)
-        self.UOIds = self.sample_list_to_dict(UOIds)
-        self.priorities = self.sample_list_to_dict(priorities)
+        self.operatingTimes = np.asarray(operatingTimes)
+        self.surgeriyIds = np.asarray(surgeriyIds)
+        self.UOIds = np.asarray(UOIds)
+        self.priorities = np.asarray(priorities)
         self.anesthesiaFlags = None
-        self.covidFlags = self.sample_list_to_dict(covidFlags)
-        self.specialties = self.sample_list_to_dict(specialties)
-        self.ids = self.sample_list_to_dict(
-            [i for i in range(1, len(operatingTimes) + 1)])
-
-    def asList(self, sampleDictionary):
-        sampleAsList = []
-        for key, value in sampleDictionary.items():
-            sampleAsList.append(value)
-        return sampleAsList
-
-    def sample_list_to_dict(self, sample):
-        dict = {}
-        idx = 1
-        for s in sample:
-            dict[(str(idx))] = s
-            idx += 1
-        return dict
+        self.covidFlags = np.asarray(covidFlags)
+        self.specialties = np.asarray(specialties)
+        self.ids = np.arange(1, len(self.operatingTimes) + 1)
+
+
+class Instance:
+    """Array-backed instance: one NumPy column per patient attribute, patient i being at position i - 1,
+    plus operatingRoomTimes (K x T) and tau (J x K x T). Planners that need the nested Pyomo data
+    dictionary get it from to_pyomo_data."""
+
+    def __init__(self, operatingTimes, priorities, delayWeights, covidFlags, specialties, precedences, operatingRoomTimes, tau):
+        self.operatingTimes = np.asarray(operatingTimes)
+        self.priorities = np.asarray(priorities)
+        self.delayWeights = np.asarray(delayWeights)
+        self.covidFlags = np.asarray(covidFlags)
+        self.specialties = np.asarray(specialties)
+        self.precedences = np.asarray(precedences)
+        self.operatingRoomTimes = np.asarray(operatingRoomTimes)
+        self.tau = np.asarray(tau)
+
+    @property
+    def I(self):
+        return len(self.operatingTimes)
+
+    @property
+    def J(self):
+        return self.tau.shape[0]
+
+    @property
+    def K(self):
+        return self.tau.shape[1]
+
+    @property
+    def T(self):
+        return self.tau.shape[2]
+
+    @classmethod
+    def from_pyomo_data(cls, data):
+        data = data[None]
+        patients = range(1, data['I'][None] + 1)
+        J, K, T = data['J'][None], data['K'][None], data['T'][None]
+        return cls(operatingTimes=[data['p'][i] for i in patients],
+                   priorities=[data['r'][i] for i in patients],
+                   delayWeights=[data['d'][i] for i in patients],
+                   covidFlags=[data['c'][i] for i in patients],
+                   specialties=[data['specialty'][i] for i in patients],
+                   precedences=[data['precedence'][i] for i in patients],
+                   operatingRoomTimes=[[data['s'][(k, t)] for t in range(1, T + 1)] for k in range(1, K + 1)],
+                   tau=[[[data['tau'][(j, k, t)] for t in range(1, T + 1)] for k in range(1, K + 1)] for j in range(1, J + 1)])
+
+    def to_pyomo_data(self):
+        I = self.I
+        patients = range(1, I + 1)
+        operatingTimes = self.operatingTimes.tolist()
+        specialties = self.specialties.tolist()
+        precedences = self.precedences.tolist()
+        maxOperatingRoomTime = 270
+        return {
+            None: {
+                'I': {None: I},
+                'J': {None: self.J},
+                'K': {None: self.K},
+                'T': {None: self.T},
+                'M': {None: 7},
+                's': {(k + 1, t + 1): value for k, row in enumerate(self.operatingRoomTimes.tolist()) for t, value in enumerate(row)},
+                'tau': {(j + 1, k + 1, t + 1): int(value) for (j, k, t), value in np.ndenumerate(self.tau)},
+                'p': dict(zip(patients, operatingTimes)),
+                'r': dict(zip(patients, self.priorities.tolist())),
+                'd': dict(zip(patients, self.delayWeights.tolist())),
+                'c': dict(zip(patients, self.covidFlags.tolist())),
+                'patientId': {i: i for i in patients},
+                'specialty': dict(zip(patients, specialties)),
+                'rho': {(i, j): int(specialties[i - 1] == j) for i in patients for j in range(1, self.J + 1)},
+                'precedence': dict(zip(patients, precedences)),
+                'bigM': {
+                    1: math.floor(maxOperatingRoomTime/min(operatingTimes)),
+                    2: maxOperatingRoomTime,
+                    3: maxOperatingRoomTime,
+                    4: maxOperatingRoomTime,
+                    5: maxOperatingRoomTime,
+                    6: I
+                }
+            }
+        }
+
+
+# (id, priority, specialty, operating time, covid, precedence) of each patient, read straight from the
+# Instance arrays (chunkSize patients at a time, so that memory does not grow with the waiting list)
+# or from the data dictionary
+def patient_rows(data, chunkSize=4096):
+    if(not isinstance(data, Instance)):
+        data = data[None]
+        yield from ((i, data['r'][i], data['specialty'][i], data['p'][i], data['c'][i], data['precedence'][i])
+                    for i in range(1, data['I'][None] + 1))
+        return
+    for start in range(0, data.I, chunkSize):
+        end = min(start + chunkSize, data.I)
+        yield from zip(range(start + 1, end + 1), data.priorities[start:end].tolist(), data.specialties[start:end].tolist(),
+                       data.operatingTimes[start:end].tolist(), data.covidFlags[start:end].tolist(), data.precedences[start:end].tolist())
+
+
+# streams the waiting list to an open file: "text" is the layout of DataMaker.data_as_string,
+# "tsv" one tab-separated row per patient under a header. data is an Instance or a data dictionary
+def write_data(data, file, format="text"):
+    if(format not in ["text", "tsv"]):
+        raise ValueError("Unknown format: " + str(format))
+    if(format == "tsv"):
+        file.write("patient_id\tpriority\tspecialty\toperating_time\tcovid\tprecedence\n")
+    for row in patient_rows(data):
+        if(format == "tsv"):
+            file.write("\t".join(map(str, row)) + "\n")
+            continue
+        (id, priority, specialty, operatingTime, covid, precedence) = row
+        file.write(str(Patient(id=id,
+                               priority=priority,
+                               specialty=specialty,
+                               operatingTime=operatingTime,
+                               covid=covid,
+                               precedence=precedence,
+                               anesthesia="N/A",
+                               room="N/A",
+                               day="N/A",
+                               anesthetist="N/A",
+                               order="N/A"
+                               )) + "\n")
 
 
 class SurgeryType(Enum):
@@ -207,7 +326,10 @@ class SurgeryType(Enum):
 
 class DataMaker:
     def __init__(self, seed):
-        np.random.seed(seed=seed)
+        # every draw goes through this instance's own generator, never numpy's global state;
+        # seed may be an int or a SeedSequence (see spawn)
+        self.seedSequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.randomGenerator = np.random.default_rng(self.seedSequence)
         # 1 if surgery is dirty; 0 else
         self.dirtySurgeryMapping = {
             "100000000000000000000": 1,
@@ -492,16 +614,56 @@ class DataMaker:
                 "100000100000000000000": 0.0625,
             },
         }
+        self.create_sampling_tables()
+
+    # n DataMakers with independent child streams of this one's seed: they can generate
+    # instances concurrently, and the same seed always yields the same children
+    def spawn(self, n):
+        return [DataMaker(seed=childSeedSequence) for childSeedSequence in self.seedSequence.spawn(n)]
+
+    # array versions of the mappings above, computed once so that sampling is vectorized;
+    # UOs and surgeries are identified by their position (code) in self.UOIds and self.surgeryIds
+    def create_sampling_tables(self):
+        self.UOIds = np.array(list(self.UOFrequencyMapping.keys()), dtype=object)
+        self.UOCumulativeFrequencies = np.cumsum(list(self.UOFrequencyMapping.values()))
+        self.surgeryIds = np.array(list(self.surgeryRoomOccupancyMapping.keys()), dtype=object)
+        self.surgeryCodes = {surgeryId: code for code, surgeryId in enumerate(self.surgeryIds)}
+        self.operatingTimeBySurgery = np.array([self.surgeryRoomOccupancyMapping[surgeryId] for surgeryId in self.surgeryIds])
+        self.dirtyBySurgery = np.array([self.dirtySurgeryMapping[surgeryId] for surgeryId in self.surgeryIds])
+        self.delayFrequencyBySurgery = np.array([self.delayFrequencyByOperation[surgeryId] for surgeryId in self.surgeryIds])
+        self.delayFrequencyByUOCode = np.array([self.delayFrequencyByUO[UOId] for UOId in self.UOIds])
+        self.surgeryCodesGivenUO = [np.array([self.surgeryCodes[surgeryId] for surgeryId in self.operationGivenUO[UOId]])
+                                    for UOId in self.UOIds]
+        self.surgeryCumulativeFrequenciesGivenUO = [np.cumsum(list(self.operationGivenUO[UOId].values()))
+                                                    for UOId in self.UOIds]
+
+    # index of the first bucket whose cumulative frequency is >= draw; the last bucket if there is none
+    @staticmethod
+    def draw_from_cumulative_frequencies(cumulativeFrequencies, draws):
+        return np.minimum(np.searchsorted(cumulativeFrequencies, draws, side="left"), len(cumulativeFrequencies) - 1)
+
+    # labels of UO and surgery codes, for output
+    def UO_labels(self, UOCodes):
+        return self.UOIds[np.asarray(UOCodes)].tolist()
+
+    def surgery_labels(self, surgeryCodes):
+        return self.surgeryIds[np.asarray(surgeryCodes)].tolist()
 
     def generate_truncnorm_sample(self, patients, lower, upper, mean, stdDev):
         a = (lower - mean) / stdDev
         b = (upper - mean) / stdDev
         truncatedNormal = truncnorm(a, b, loc=mean, scale=stdDev)
-        sample = truncatedNormal.rvs(patients)
+        sample = truncatedNormal.rvs(patients, random_state=self.randomGenerator)
         return sample
 
+    # two specialties are split by specialtyBalance; more are drawn uniformly
+    def draw_specialties(self, dataDescriptor):
+        if(dataDescriptor.specialties == 2):
+            return self.generate_binomial_sample(dataDescriptor.patients, dataDescriptor.specialtyBalance, isSpecialty=True)
+        return self.randomGenerator.integers(1, dataDescriptor.specialties + 1, size=dataDescriptor.patients)
+
     def generate_binomial_sample(self, patients, p, isSpecialty):
-        sample = binom.rvs(1, p, size=patients)
+        sample = binom.rvs(1, p, size=patients, random_state=self.randomGenerator)
         if(isSpecialty):
             sample = sample + 1
         return sample
@@ -539,36 +701,21 @@ class DataMaker:
                     dict[(i + 1, j + 1)] = 0
         return dict
 
+    # rooms are split in J consecutive blocks, one per specialty (rooms 1-2 to specialty 1 and 3-4 to specialty 2 when J = 2, K = 4)
     def create_room_specialty_assignment(self, J, K, T):
         dict = {}
         for j in range(0, J):
             for k in range(0, K):
                 for t in range(0, T):
-                    if((j + 1 == 1 and (k + 1 == 1 or k + 1 == 2)) or (j + 1 == 2 and (k + 1 == 3 or k + 1 == 4))):
+                    if(k * J // K == j):
                         dict[(j + 1, k + 1, t + 1)] = 1
                     else:
                         dict[(j + 1, k + 1, t + 1)] = 0
         return dict
 
-    def create_precedence(self, precedences):
-        dict = {}
-        for i1 in range(1, len(precedences) + 1):
-            for i2 in range(1, len(precedences) + 1):
-                dict[(i1, i2)] = 0
-                dict[(i2, i1)] = 0
-                if(i1 == i2):
-                    continue
-                if(precedences[i1 - 1] < precedences[i2 - 1]):
-                    dict[(i1, i2)] = 1
-                    continue
-                if(precedences[i2 - 1] < precedences[i1 - 1]):
-                    dict[(i2, i1)] = 1
-                    continue
-        return dict
-
-    def generate_data(self, dataDescriptor: DataDescriptor):
+    def generate_data(self, dataDescriptor: DataDescriptor, delayEstimate="UO"):
         dataContainer = self.create_data_container(dataDescriptor)
-        return self.create_data_dictionary(dataContainer, dataDescriptor)
+        return self.create_data_dictionary(dataContainer, dataDescriptor, delayEstimate)
 
     def create_data_container(self, dataDescriptor: DataDescriptor) -> DataContainer:
         operatingRoomTimes = self.create_room_timetable(dataDescriptor.operatingRooms,
@@ -588,60 +735,86 @@ class DataMaker:
         covidFlags = self.generate_binomial_sample(dataDescriptor.patients,
                                                    dataDescriptor.covidFrequence,
                                                    isSpecialty=False)
-        specialties = self.generate_binomial_sample(dataDescriptor.patients,
-                                                    dataDescriptor.specialtyBalance,
-                                                    isSpecialty=True)
+        specialties = self.draw_specialties(dataDescriptor)
         return DataContainer(operatingRoomTimes, None, operatingTimes, operations, UOs, priorities, None, covidFlags, specialties)
 
     def create_data_dictionary(self, dataContainer: DataContainer, dataDescriptor: DataDescriptor, delayEstimate):
-        operatingRoomTimes = dataContainer.operatingRoomTimes
-        operatingTimes = dataContainer.asList(dataContainer.operatingTimes)
-        surgeryIds = dataContainer.asList(dataContainer.surgeriyIds)
-        UOIds = dataContainer.asList(dataContainer.UOIds)
-        priorities = dataContainer.asList(dataContainer.priorities)
-        covidFlags = dataContainer.asList(dataContainer.covidFlags)
-        specialties = dataContainer.asList(dataContainer.specialties)
-        ids = dataContainer.asList(dataContainer.ids)
-        maxOperatingRoomTime = 270
-        delayWeight = dataDescriptor.delayWeight
+        arrays = self.create_instance_arrays(dataContainer, dataDescriptor, delayEstimate)
+        return self.create_data_dictionary_from_arrays(arrays, dataDescriptor.delayWeight)
 
-        surgeryTypes = self.compute_surgery_types(surgeryIds, covidFlags)
+    # the Instance drawn directly, without going through a DataContainer or a data dictionary;
+    # same draws, hence same instance, as create_data_container followed by create_data_dictionary
+    def create_instance(self, dataDescriptor: DataDescriptor, delayEstimate):
+        return self.create_instance_from_arrays(self.draw_instance_arrays(dataDescriptor, delayEstimate), dataDescriptor.delayWeight)
+
+    # the arrays of create_instance, before the delay weight is applied
+    def draw_instance_arrays(self, dataDescriptor: DataDescriptor, delayEstimate):
+        UOs = self.draw_UO(dataDescriptor.patients)
+        operations = self.draw_operations_given_UO(UOs)
+        operatingTimes = self.compute_operating_times(operations)
+        priorities = self.generate_truncnorm_sample(dataDescriptor.patients,
+                                                    dataDescriptor.priorityDistribution.low,
+                                                    dataDescriptor.priorityDistribution.high,
+                                                    dataDescriptor.priorityDistribution.mean,
+                                                    dataDescriptor.priorityDistribution.stdDev)
+        covidFlags = self.generate_binomial_sample(dataDescriptor.patients,
+                                                   dataDescriptor.covidFrequence,
+                                                   isSpecialty=False)
+        specialties = self.draw_specialties(dataDescriptor)
+        operatingRoomTimes = np.full((dataDescriptor.operatingRooms, dataDescriptor.days), dataDescriptor.operatingDayDuration)
+        return self.complete_instance_arrays(dataDescriptor, delayEstimate, operatingRoomTimes, operatingTimes, operations, UOs,
+                                             priorities, covidFlags, specialties)
+
+    # the instance as arrays: one column per patient, operatingRoomTimes (K x T) and tau (J x K x T);
+    # the delay weight is not applied yet, so the same arrays serve every delayWeight
+    def create_instance_arrays(self, dataContainer: DataContainer, dataDescriptor: DataDescriptor, delayEstimate):
+        operatingRoomTimes = np.array([[dataContainer.operatingRoomTimes[(k, t)] for t in range(1, dataDescriptor.days + 1)]
+                                       for k in range(1, dataDescriptor.operatingRooms + 1)])
+        return self.complete_instance_arrays(dataDescriptor, delayEstimate, operatingRoomTimes,
+                                             dataContainer.operatingTimes,
+                                             dataContainer.surgeriyIds,
+                                             dataContainer.UOIds,
+                                             dataContainer.priorities,
+                                             dataContainer.covidFlags,
+                                             dataContainer.specialties)
+
+    # surgeryCodes and UOCodes index self.surgeryIds and self.UOIds
+    def complete_instance_arrays(self, dataDescriptor, delayEstimate, operatingRoomTimes, operatingTimes, surgeryCodes, UOCodes, priorities, covidFlags, specialties):
+        surgeryTypes = self.compute_surgery_types(surgeryCodes, covidFlags)
         delayFlags = None
         if(delayEstimate == "UO"):
-            delayFlags = self.draw_delay_flags_by_UO(UOIds)
+            delayFlags = self.draw_delay_flags_by_UO(UOCodes)
         if(delayEstimate == "procedure"):
-            delayFlags = self.draw_delay_flags_by_operation(surgeryIds)
-        delayWeights = self.compute_delay_weights(delayFlags, delayWeight)
+            delayFlags = self.draw_delay_flags_by_operation(surgeryCodes)
         precedences = self.compute_precedences(surgeryTypes, delayFlags)
+        tau = self.create_room_specialty_assignment(dataDescriptor.specialties, dataDescriptor.operatingRooms, dataDescriptor.days)
         return {
-            None: {
-                'I': {None: dataDescriptor.patients},
-                'J': {None: dataDescriptor.specialties},
-                'K': {None: dataDescriptor.operatingRooms},
-                'T': {None: dataDescriptor.days},
-                'M': {None: 7},
-                's': operatingRoomTimes,
-                'tau': self.create_room_specialty_assignment(dataDescriptor.specialties, dataDescriptor.operatingRooms, dataDescriptor.days),
-                'p': self.create_dictionary_entry(operatingTimes, toRound=False),
-                'r': self.create_dictionary_entry(priorities, toRound=True),
-                'd': self.create_dictionary_entry(delayWeights, toRound=False),
-                'c': self.create_dictionary_entry(covidFlags, toRound=False),
-                'u': self.create_precedence(precedences),
-                'patientId': self.create_dictionary_entry(ids, toRound=False),
-                'specialty': self.create_dictionary_entry(specialties, toRound=False),
-                'rho': self.create_patient_specialty_table(dataDescriptor.patients, dataDescriptor.specialties, self.create_dictionary_entry(specialties, toRound=False)),
-                'precedence': self.create_dictionary_entry(precedences, toRound=False),
-                'bigM': {
-                    1: math.floor(maxOperatingRoomTime/min(operatingTimes)),
-                    2: maxOperatingRoomTime,
-                    3: maxOperatingRoomTime,
-                    4: maxOperatingRoomTime,
-                    5: maxOperatingRoomTime,
-                    6: dataDescriptor.patients
-                }
-            }
+            'operatingTimes': np.array(operatingTimes),
+            # rounded half to even, like round()
+            'priorities': np.rint(priorities).astype(int),
+            'covidFlags': np.array(covidFlags, dtype=int),
+            'specialties': np.array(specialties, dtype=int),
+            'delayFlags': np.array(delayFlags, dtype=int),
+            'precedences': np.array(precedences, dtype=int),
+            'operatingRoomTimes': np.asarray(operatingRoomTimes),
+            'tau': np.array([[[tau[(j, k, t)] for t in range(1, dataDescriptor.days + 1)]
+                              for k in range(1, dataDescriptor.operatingRooms + 1)]
+                             for j in range(1, dataDescriptor.specialties + 1)])
         }
 
+    def create_instance_from_arrays(self, arrays, delayWeight):
+        return Instance(operatingTimes=arrays['operatingTimes'],
+                        priorities=arrays['priorities'],
+                        delayWeights=np.asarray(self.compute_delay_weights(arrays['delayFlags'], delayWeight)),
+                        covidFlags=arrays['covidFlags'],
+                        specialties=arrays['specialties'],
+                        precedences=arrays['precedences'],
+                        operatingRoomTimes=arrays['operatingRoomTimes'],
+                        tau=arrays['tau'])
+
+    def create_data_dictionary_from_arrays(self, arrays, delayWeight):
+        return self.create_instance_from_arrays(arrays, delayWeight).to_pyomo_data()
+
     def print_data(self, data):
         patientNumber = data[None]['I'][None]
         for i in range(0, patientNumber):
@@ -667,124 +840,46 @@ class DataMaker:
         print("\n")
 
     def data_as_string(self, data):
-        result = ""
-        patientNumber = data[None]['I'][None]
-        for i in range(0, patientNumber):
-            id = i + 1
-            priority = data[None]['r'][(i + 1)]
-            specialty = data[None]['specialty'][(i + 1)]
-            operatingTime = data[None]['p'][(i + 1)]
-            covid = data[None]['c'][(i + 1)]
-            precedence = data[None]['precedence'][(i + 1)]
-            # anesthesia = data[None]['a'][(i + 1)]
-            result = result + str(Patient(id=id,
-                          priority=priority,
-                          specialty=specialty,
-                          operatingTime=operatingTime,
-                          covid=covid,
-                          precedence=precedence,
-                          anesthesia="N/A",
-                          room="N/A",
-                          day="N/A",
-                          anesthetist="N/A",
-                          order="N/A"
-                          )) + "\n"
-        return result
+        buffer = io.StringIO()
+        write_data(data, buffer)
+        return buffer.getvalue()
 
+    # UO codes, indexing self.UOIds
     def draw_UO(self, n):
-        UOIds = list(self.UOFrequencyMapping.keys())
-        UOIdsFrequencies = list(self.UOFrequencyMapping.values())
-        cumulativeSum = np.cumsum(UOIdsFrequencies)
-        draws = uniform.rvs(size=n)
-        UOs = [""] * n
-        for i in range(0, len(draws)):
-            for j in range(0, len(cumulativeSum)):
-                if(draws[i] <= cumulativeSum[j]):
-                    UOs[i] = UOIds[j]
-                    break
-            if(UOs[i] == ""):
-                UOs[i] = UOIds[-1]
-        return UOs
-
-    def draw_operations_given_UO(self, UOs):
-        n = len(UOs)
-        draws = uniform.rvs(size=n)
-        operations = []
-        for i in range(0, n):
-            surgeryIds = list(self.operationGivenUO[UOs[i]].keys())
-            surgeryIdsFrequencies = list(self.operationGivenUO[UOs[i]].values())
-            cumulativeSum = np.cumsum(surgeryIdsFrequencies)
-            times = np.zeros(n) - 1
-            for j in range(0, len(cumulativeSum)):
-                if(draws[i] <= cumulativeSum[j]):
-                    times[i] = self.surgeryRoomOccupancyMapping[surgeryIds[j]]
-                    operations.append(surgeryIds[j])
-                    break
-            if(times[i] == -1):
-                times[i] = self.surgeryRoomOccupancyMapping[surgeryIds[-1]]
-                operations.append(surgeryIds[-1])
-        return operations
-
-    def draw_delay_flags_by_UO(self, UOs):
-        draws = uniform.rvs(size=len(UOs))
-        delayFlags = []
-        for i in range(0, len(draws)):
-            if(draws[i] <= self.delayFrequencyByUO[UOs[i]]):
-                delayFlags.append(1)
-            else:
-                delayFlags.append(0)
-        return delayFlags
-
-    def compute_operating_times(self, operations):
-        times = []
-        for operation in operations:
-            times.append(self.surgeryRoomOccupancyMapping[operation])
-        return times
-
-    def draw_delay_flags_by_operation(self, patientSurgeryIds):
-        draws = uniform.rvs(size=len(patientSurgeryIds))
-        delayFlags = []
-        for i in range(0, len(draws)):
-            if(draws[i] <= self.delayFrequencyByOperation[patientSurgeryIds[i]]):
-                delayFlags.append(1)
-            else:
-                delayFlags.append(0)
-        return delayFlags
-
-    def compute_surgery_types(self, surgeryIds, covidFlags):
-        surgeryTypes = []
-        for i in range(0, len(surgeryIds)):
-            if(covidFlags[i] == 1):
-                surgeryTypes.append(SurgeryType.COVID)
-                continue
-            if(self.dirtySurgeryMapping[surgeryIds[i]] == 1):
-                surgeryTypes.append(SurgeryType.DIRTY)
-                continue
-            surgeryTypes.append(SurgeryType.CLEAN)
-        return surgeryTypes
-
+        draws = uniform.rvs(size=n, random_state=self.randomGenerator)
+        return self.draw_from_cumulative_frequencies(self.UOCumulativeFrequencies, draws)
+
+    # surgery codes, indexing self.surgeryIds
+    def draw_operations_given_UO(self, UOCodes):
+        UOCodes = np.asarray(UOCodes)
+        n = len(UOCodes)
+        draws = uniform.rvs(size=n, random_state=self.randomGenerator)
+        surgeryCodes = np.zeros(n, dtype=int)
+        for UOCode in np.unique(UOCodes):
+            patients = np.flatnonzero(UOCodes == UOCode)
+            buckets = self.draw_from_cumulative_frequencies(self.surgeryCumulativeFrequenciesGivenUO[UOCode], draws[patients])
+            surgeryCodes[patients] = self.surgeryCodesGivenUO[UOCode][buckets]
+        return surgeryCodes
+
+    def draw_delay_flags_by_UO(self, UOCodes):
+        draws = uniform.rvs(size=len(UOCodes), random_state=self.randomGenerator)
+        return (draws <= self.delayFrequencyByUOCode[np.asarray(UOCodes)]).astype(int)
+
+    def compute_operating_times(self, surgeryCodes):
+        return self.operatingTimeBySurgery[np.asarray(surgeryCodes)]
+
+    def draw_delay_flags_by_operation(self, surgeryCodes):
+        draws = uniform.rvs(size=len(surgeryCodes), random_state=self.randomGenerator)
+        return (draws <= self.delayFrequencyBySurgery[np.asarray(surgeryCodes)]).astype(int)
+
+    # SurgeryType values, as an array
+    def compute_surgery_types(self, surgeryCodes, covidFlags):
+        surgeryTypes = np.where(self.dirtyBySurgery[np.asarray(surgeryCodes)] == 1, SurgeryType.DIRTY.value, SurgeryType.CLEAN.value)
+        return np.where(np.asarray(covidFlags) == 1, SurgeryType.COVID.value, surgeryTypes)
+
+    # 1 clean, 2 clean delayed, 3 dirty, 4 dirty delayed, 5 covid, 6 covid delayed
     def compute_precedences(self, surgeryTypes, delayFlags):
-        precedences = []
-        for i in range(0, len(surgeryTypes)):
-            if(surgeryTypes[i] == SurgeryType.CLEAN and delayFlags[i] == 0):
-                precedences.append(1)
-            if(surgeryTypes[i] == SurgeryType.CLEAN and delayFlags[i] == 1):
-                precedences.append(2)
-            if(surgeryTypes[i] == SurgeryType.DIRTY and delayFlags[i] == 0):
-                precedences.append(3)
-            if(surgeryTypes[i] == SurgeryType.DIRTY and delayFlags[i] == 1):
-                precedences.append(4)
-            if(surgeryTypes[i] == SurgeryType.COVID and delayFlags[i] == 0):
-                precedences.append(5)
-            if(surgeryTypes[i] == SurgeryType.COVID and delayFlags[i] == 1):
-                precedences.append(6)
-        return precedences
+        return 2 * (np.asarray(surgeryTypes) - 1) + 1 + np.asarray(delayFlags)
 
     def compute_delay_weights(self, delayFlags, delayWeight):
-        delayWeights = []
-        for df in delayFlags:
-            if(df == 1):
-                delayWeights.append(delayWeight)
-            else:
-                delayWeights.append(1.0)
-        return delayWeights
\ No newline at end of file
+        return np.where(np.asarray(delayFlags) == 1, delayWeight, 1.0)
\ No newline at end of file
@@ -0,0 +1,188 @@
+import copy
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from data_maker import Instance
+from planners import Planner
+
+DECOMPOSE_PREFIX = "decomposed:"
+
+
+def is_decomposed(solver):
+    return solver.startswith(DECOMPOSE_PREFIX)
+
+
+# "cplex" -> "decomposed:cplex", the sweep's name for solving each block with cplex
+def decomposed_solver(solver):
+    return DECOMPOSE_PREFIX + solver
+
+
+def block_solver(solver):
+    return solver[len(DECOMPOSE_PREFIX):]
+
+
+def solve_block(plannerClass, plannerArguments, threads, blockData, warmStart):
+    planner = plannerClass(**plannerArguments)
+    if(threads is not None):
+        planner.set_threads(threads)
+    runInfo = planner.solve_model(blockData, warmStart)
+    return runInfo, planner.extract_solution()
+
+
+class DecomposedPlanner:
+    """Splits an instance into blocks of specialties and rooms that share no patient or room,
+    solves the blocks in parallel with plannerClass and merges the results."""
+
+    def __init__(self, plannerClass, timeLimit, gap, solver, maxWorkers=None, **plannerArguments):
+        self.plannerClass = plannerClass
+        self.plannerArguments = dict(plannerArguments, timeLimit=timeLimit, gap=gap, solver=solver)
+        self.maxWorkers = maxWorkers
+        self.threads = None
+        self.solution = None
+
+    # the blocks share the threads, as they are solved at the same time
+    def set_threads(self, threads):
+        self.threads = threads
+
+    # connected components of the specialty-room graph, where j and k are linked if tau[j, k, t] == 1 on some day
+    @staticmethod
+    def find_blocks(data):
+        J = data[None]['J'][None]
+        K = data[None]['K'][None]
+        tau = data[None]['tau']
+        # union-find over specialties (j) and rooms (K + k)
+        parent = list(range(J + K + 1))
+
+        def find(node):
+            while(parent[node] != node):
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for (j, k, t), value in tau.items():
+            if(value == 1):
+                parent[find(j)] = find(J + k)
+
+        blocks = {}
+        for j in range(1, J + 1):
+            blocks.setdefault(find(j), ([], []))[0].append(j)
+        for k in range(1, K + 1):
+            blocks.setdefault(find(J + k), ([], []))[1].append(k)
+        return [(specialties, rooms) for (specialties, rooms) in blocks.values() if specialties and rooms]
+
+    # data dictionary restricted to a block, with patients, specialties and rooms renumbered from 1
+    @staticmethod
+    def create_block_data(data, specialties, rooms):
+        data = data[None]
+        T = data['T'][None]
+        patients = [i for i in range(1, data['I'][None] + 1) if data['specialty'][i] in specialties]
+        patientIndex = {i: idx + 1 for idx, i in enumerate(patients)}
+        specialtyIndex = {j: idx + 1 for idx, j in enumerate(specialties)}
+        roomIndex = {k: idx + 1 for idx, k in enumerate(rooms)}
+
+        blockData = {
+            'I': {None: len(patients)},
+            'J': {None: len(specialties)},
+            'K': {None: len(rooms)},
+            'T': {None: T},
+            'M': data['M'],
+            's': {(roomIndex[k], t): data['s'][(k, t)] for k in rooms for t in range(1, T + 1)},
+            'tau': {(specialtyIndex[j], roomIndex[k], t): data['tau'][(j, k, t)] for j in specialties for k in rooms for t in range(1, T + 1)},
+            'specialty': {patientIndex[i]: specialtyIndex[data['specialty'][i]] for i in patients},
+            'bigM': {**data['bigM'], 6: len(patients)}
+        }
+        for name in ['p', 'r', 'd', 'c', 'patientId', 'precedence']:
+            blockData[name] = {patientIndex[i]: data[name][i] for i in patients}
+        return {None: blockData}, patients
+
+    # the part of a solution dict on a block's rooms, renumbered like the block's data;
+    # the caller's patients are copied, not changed
+    @staticmethod
+    def create_block_warm_start(warmStart, patients, rooms, T):
+        patientIndex = {i: idx + 1 for idx, i in enumerate(patients)}
+        blockWarmStart = {}
+        for idx, k in enumerate(rooms):
+            for t in range(1, T + 1):
+                blockWarmStart[(idx + 1, t)] = []
+                for patient in warmStart.get((k, t), []):
+                    if(patient.id in patientIndex):
+                        blockPatient = copy.copy(patient)
+                        blockPatient.id = patientIndex[patient.id]
+                        blockWarmStart[(idx + 1, t)].append(blockPatient)
+        return blockWarmStart
+
+    def solve_model(self, data, warmStart=None):
+        t = time.time()
+        if(isinstance(data, Instance)):
+            data = data.to_pyomo_data()
+        blocks = self.find_blocks(data)
+        blockData = []
+        for (specialties, rooms) in blocks:
+            block, patients = self.create_block_data(data, specialties, rooms)
+            if(len(patients) > 0):
+                blockData.append((specialties, rooms, block, patients))
+        print("Solving " + str(len(blockData)) + " independent blocks...")
+
+        self.solution = {(k, t): [] for k in range(1, data[None]['K'][None] + 1) for t in range(1, data[None]['T'][None] + 1)}
+        if(len(blockData) == 0):
+            # no patient can be operated: the empty schedule is optimal
+            return {"Model_builder": None,
+                    "Model_building_time": 0,
+                    "Solving_time": 0,
+                    "Status_OK": True,
+                    "Objective_Function_Value": 0,
+                    "Time_Limit_Hit": False,
+                    "Gap": None,
+                    "Optimal": True,
+                    "Warm_start_provided": None,
+                    "Blocks": 0,
+                    "Wall_clock_time": (time.time() - t)}
+
+        workers = max(1, self.maxWorkers or len(blockData))
+        threads = None if self.threads is None else max(1, self.threads // min(workers, len(blockData)))
+        T = data[None]['T'][None]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(solve_block, self.plannerClass, self.plannerArguments, threads, block,
+                                       None if warmStart is None else self.create_block_warm_start(warmStart, patients, rooms, T))
+                       for (_, rooms, block, patients) in blockData]
+            results = [future.result() for future in futures]
+        elapsed = (time.time() - t)
+
+        for (specialties, rooms, _, patients), (_, blockSolution) in zip(blockData, results):
+            for (k, t), blockPatients in blockSolution.items():
+                for patient in blockPatients:
+                    patient.id = patients[patient.id - 1]
+                    patient.room = rooms[k - 1]
+                    patient.specialty = specialties[patient.specialty - 1]
+                self.solution[(rooms[k - 1], t)] = blockPatients
+
+        blockRunInfos = [runInfo for (runInfo, _) in results]
+        # some solvers report no gap
+        gaps = [ri["Gap"] for ri in blockRunInfos if ri["Gap"] is not None]
+        runInfo = {
+                    "Model_builder": blockRunInfos[0]["Model_builder"],
+                    "Model_building_time": max(ri["Model_building_time"] for ri in blockRunInfos),
+                    "Solving_time": max(ri["Solving_time"] for ri in blockRunInfos),
+                    "Status_OK": all(ri["Status_OK"] for ri in blockRunInfos),
+                    "Objective_Function_Value": sum(ri["Objective_Function_Value"] for ri in blockRunInfos),
+                    "Time_Limit_Hit": any(ri["Time_Limit_Hit"] for ri in blockRunInfos),
+                    "Gap": max(gaps) if len(gaps) > 0 else None,
+                    "Optimal": all(ri["Optimal"] for ri in blockRunInfos),
+                    "Warm_start_provided": None if warmStart is None else all(ri.get("Warm_start_provided") for ri in blockRunInfos),
+                    "Blocks": len(blockRunInfos),
+                    "Wall_clock_time": elapsed
+                    }
+        for idx, blockRunInfo in enumerate(blockRunInfos):
+            runInfo["Block_" + str(idx + 1) + "_Patients"] = len(blockData[idx][3])
+            runInfo["Block_" + str(idx + 1) + "_Solving_time"] = blockRunInfo["Solving_time"]
+        return runInfo
+
+    # the blocks' models live in the worker processes: every solve builds them anew
+    def resolve_model(self, data):
+        return self.solve_model(data)
+
+    def extract_solution(self):
+        return self.solution
+
+    def extract_solution_arrays(self):
+        return Planner.solution_to_arrays(self.solution)
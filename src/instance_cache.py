@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from data_maker import DataMaker, TruncatedNormalParameters
+
+# bump when create_instance_arrays changes what it draws, so that stale entries are never hit
+CACHE_VERSION = 1
+
+
+def descriptor_fields(dataDescriptor):
+    # delayWeight only rescales d, which is done on load: it is not part of the key
+    fields = {}
+    for name, value in vars(dataDescriptor).items():
+        if(name == "_delayWeight"):
+            continue
+        fields[name.lstrip("_")] = vars(value) if isinstance(value, TruncatedNormalParameters) else value
+    return fields
+
+
+def seed_fields(seed):
+    if(isinstance(seed, np.random.SeedSequence)):
+        return {"entropy": seed.entropy, "spawnKey": list(seed.spawn_key)}
+    return seed
+
+
+def cache_key(dataDescriptor, seed, delayEstimate):
+    key = {"version": CACHE_VERSION,
+           "dataDescriptor": descriptor_fields(dataDescriptor),
+           "seed": seed_fields(seed),
+           "delayEstimate": delayEstimate}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def directory_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+class InstanceCache:
+    """On-disk cache of generated instances, keyed by a hash of the DataDescriptor fields, the seed
+    and delayEstimate. An entry is a directory with one .npy per instance array, memory-mapped on load;
+    the delay weight is applied when the instance is loaded. Least recently used entries are
+    evicted once the cache grows beyond maxBytes."""
+
+    def __init__(self, directory=".instance_cache", maxBytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(directory, exist_ok=True)
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key)
+
+    def load_arrays(self, key):
+        path = self.entry_path(key)
+        if(not os.path.isdir(path)):
+            return None
+        try:
+            arrays = {name[:-len(".npy")]: np.load(os.path.join(path, name), mmap_mode="r")
+                      for name in os.listdir(path) if name.endswith(".npy")}
+            # the entry's modification time is its last use
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted by another process meanwhile
+            return None
+        return arrays
+
+    def store_arrays(self, key, arrays):
+        # written aside and renamed into place, so that concurrent workers never read a partial entry
+        temporaryPath = tempfile.mkdtemp(dir=self.directory, prefix=".tmp_")
+        for name, array in arrays.items():
+            np.save(os.path.join(temporaryPath, name + ".npy"), array)
+        try:
+            os.rename(temporaryPath, self.entry_path(key))
+        except OSError:
+            # another worker stored the same entry first
+            shutil.rmtree(temporaryPath, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if(entry.is_dir() and not entry.name.startswith(".tmp_")):
+                try:
+                    entries.append((entry.stat().st_mtime, directory_size(entry.path), entry.path))
+                except FileNotFoundError:
+                    continue
+        totalBytes = sum(size for (_, size, _) in entries)
+        for (_, size, path) in sorted(entries):
+            if(totalBytes <= self.maxBytes):
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            totalBytes -= size
+
+    def get_arrays(self, dataDescriptor, seed, delayEstimate):
+        key = cache_key(dataDescriptor, seed, delayEstimate)
+        arrays = self.load_arrays(key)
+        if(arrays is None):
+            dataMaker = DataMaker(seed=seed)
+            arrays = dataMaker.draw_instance_arrays(dataDescriptor, delayEstimate)
+            self.store_arrays(key, arrays)
+        return arrays
+
+    def get_instance(self, dataDescriptor, seed, delayEstimate):
+        arrays = self.get_arrays(dataDescriptor, seed, delayEstimate)
+        return DataMaker(seed=seed).create_instance_from_arrays(arrays, dataDescriptor.delayWeight)
+
+    # same dictionary as DataMaker(seed).create_data_dictionary(dataContainer, dataDescriptor, delayEstimate)
+    def get_data_dictionary(self, dataDescriptor, seed, delayEstimate):
+        return self.get_instance(dataDescriptor, seed, delayEstimate).to_pyomo_data()
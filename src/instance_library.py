@@ -0,0 +1,148 @@
+import argparse
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from data_maker import DataMaker
+from sweep import DEFAULT_GRID, create_data_descriptor, load_instance_file, test_id
+
+MANIFEST_FILE = "manifest.json"
+
+# combination keys that are not dataDescriptor fields
+COMBINATION_KEYS = ["patients", "covid", "delayEstimate", "specialties", "operatingRooms"]
+
+# instances of the default sweep grid; a config file overrides any of these keys
+DEFAULT_LIBRARY = {
+    "combinations": [{"patients": s, "covid": c, "delayEstimate": de}
+                     for de in DEFAULT_GRID["delayEstimate"] for s in DEFAULT_GRID["size"] for c in DEFAULT_GRID["covid"]],
+    "replications": 1,
+    "seed": DEFAULT_GRID["seed"],
+    "dataDescriptor": DEFAULT_GRID["dataDescriptor"]
+}
+
+
+def load_library_config(configFile=None):
+    config = json.loads(json.dumps(DEFAULT_LIBRARY))
+    if(configFile is None):
+        return config
+    with open(configFile) as f:
+        overrides = json.load(f)
+    unknownKeys = set(overrides) - set(config)
+    if(unknownKeys):
+        raise ValueError("Unknown library keys in " + configFile + ": " + ", ".join(sorted(unknownKeys)))
+    config["dataDescriptor"].update(overrides.pop("dataDescriptor", {}))
+    config.update(overrides)
+    return config
+
+
+def instance_file(index):
+    return "instance_" + str(index).zfill(5) + ".npz"
+
+
+# runs in a worker process: generate one instance and write its arrays to path.
+# The delay weight is left out, since it is applied when the instance is loaded
+def generate_instance(combination, descriptorFields, seedSequence, path):
+    descriptorFields = dict(descriptorFields, **{key: value for key, value in combination.items() if key not in COMBINATION_KEYS})
+    dataDescriptor = create_data_descriptor(dict(combination, delayWeight=None), descriptorFields)
+    arrays = DataMaker(seed=seedSequence).draw_instance_arrays(dataDescriptor, combination["delayEstimate"])
+    np.savez_compressed(path, **arrays)
+    return path
+
+
+def generate_library(config, outputDirectory, workers=None):
+    os.makedirs(outputDirectory, exist_ok=True)
+    combinations = config["combinations"]
+    replications = config["replications"]
+    # one independent child stream per instance; the same seed always yields the same library
+    seedSequences = np.random.SeedSequence(config["seed"]).spawn(len(combinations) * replications)
+
+    instances = []
+    for index, (combination, replication) in enumerate(itertools.product(combinations, range(1, replications + 1))):
+        instances.append({"file": instance_file(index + 1),
+                          "combination": combination,
+                          "replication": replication,
+                          "spawnKey": list(seedSequences[index].spawn_key)})
+
+    print("Generating " + str(len(instances)) + " instances in " + outputDirectory + "...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(generate_instance, instance["combination"], config["dataDescriptor"], seedSequence,
+                                   os.path.join(outputDirectory, instance["file"]))
+                   for instance, seedSequence in zip(instances, seedSequences)]
+        for future in as_completed(futures):
+            future.result()
+
+    manifest = {"seed": config["seed"],
+                "replications": replications,
+                "dataDescriptor": config["dataDescriptor"],
+                "instances": instances}
+    with open(os.path.join(outputDirectory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print("Done.")
+    return manifest
+
+
+class InstanceLibrary:
+    """Read side of a directory written by generate_library: the manifest lists every instance,
+    and each instance is loaded, as an Instance or a data dictionary, for a given delay weight."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        # only used for the dictionary stage, which draws nothing
+        self.dataMaker = DataMaker(seed=self.manifest["seed"])
+
+    # manifest entries; keyword arguments filter on the combination and replication, e.g. instances(patients=100, delayEstimate="UO")
+    def instances(self, **filters):
+        return [instance for instance in self.manifest["instances"]
+                if all(dict(instance["combination"], replication=instance["replication"]).get(key) == value for key, value in filters.items())]
+
+    def load_arrays(self, instance):
+        return load_instance_file(self.instance_path(instance))
+
+    def instance_path(self, instance):
+        return os.path.join(self.directory, instance["file"])
+
+    def load_instance(self, instance, delayWeight):
+        return self.dataMaker.create_instance_from_arrays(self.load_arrays(instance), delayWeight)
+
+    def load_data_dictionary(self, instance, delayWeight):
+        return self.load_instance(instance, delayWeight).to_pyomo_data()
+
+
+# sweep cells over the library's instances, in manifest order: one per solver, delay weight and instance.
+# Each cell names its instance file, which the sweep loads instead of drawing the instance
+def create_cells_from_library(library, solvers, delayWeights):
+    cells = []
+    for solver in solvers:
+        for dw in delayWeights:
+            for id, instance in enumerate(library.instances(), start=1):
+                combination = instance["combination"]
+                cells.append(dict(combination,
+                                  testId=test_id(combination["delayEstimate"], dw, id),
+                                  solver=solver,
+                                  delayWeight=dw,
+                                  replication=instance["replication"],
+                                  instanceFile=os.path.abspath(library.instance_path(instance))))
+    return cells
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Generate a fixed library of instances, to be shared by solver benchmarks.")
+    parser.add_argument("--config", help="JSON file overriding the default library (combinations, replications, seed, dataDescriptor)")
+    parser.add_argument("--output", default="instances", help="directory for the instances and their " + MANIFEST_FILE + " (default: instances)")
+    parser.add_argument("--replications", type=int, help="instances per combination (overrides the config)")
+    parser.add_argument("--seed", type=int, help="root seed (overrides the config)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    config = load_library_config(args.config)
+    if(args.replications is not None):
+        config["replications"] = args.replications
+    if(args.seed is not None):
+        config["seed"] = args.seed
+    generate_library(config, args.output, args.workers)
@@ -1,94 +1,66 @@
-import logging
-import sys
-import time
-from data_maker import DataDescriptor, DataMaker, TruncatedNormalParameters
+import argparse
+import functools
+import glob
+
+from decomposition import decomposed_solver
+from instance_library import InstanceLibrary, create_cells_from_library
 from planners import SinglePhaseStartingMinutePlanner
-from utils import SolutionVisualizer
+from sweep import SweepRunner, create_cells, load_grid, merge_results, parse_shard, race_solver, render_schedules, shard_cells, shard_results_file
 if __name__ == '__main__':
 
-    solvers = ["cplex"]
-    size = [100, 120]
-    covid = [0.0, 0.25, 0.5, 0.75, 1.0]
-    delayWeights = [0.25, 0.5, 0.75]
-    delayEstimate = ["UO", "procedure"]
-
-    runDataLogger = logging.Logger("runDataLogger")
-    runDataLogger.setLevel(logging.INFO)
-    runDataFileHandler = logging.FileHandler("results.log")
-    runDataFileHandler.setLevel(logging.INFO)
-    runDataLogger.addHandler(runDataFileHandler)
-    runDataLogger.info("Test_id\tSolver\tPatients\tCovid_frequency\tModel_building_time\tSolving_time\tOverall_time\tStatus_OK\tObjective_Function_Value\tTime_Limit_Hit\tGap\tSelected_patients\tSelected_patients_partitioning_by_precedence\tDelay_estimation\tDelay_weight")
-
-    for solver in solvers:
-        for de in delayEstimate:
-            id = 1
-            for dw in delayWeights:
-                for s in size:
-                    for c in covid:
-                        solutionLogger = logging.Logger("solutionLogger")
-                        solutionLogger.setLevel(logging.INFO)
-                        solutionFileHandler = logging.FileHandler("T_" + str(de) + "_di_"+ str(dw) + "_" + str(id) + ".log")
-                        solutionFileHandler.setLevel(logging.INFO)
-                        solutionLogger.addHandler(solutionFileHandler)
-
-
-                        planner = SinglePhaseStartingMinutePlanner(timeLimit=300, gap = 0.005, solver=solver)
-
-                        dataDescriptor = DataDescriptor()
-
-                        dataDescriptor.patients = s
-                        dataDescriptor.days = 5
-                        dataDescriptor.anesthetists = "N/A"
-                        dataDescriptor.covidFrequence = c
-                        dataDescriptor.anesthesiaFrequence = "N/A"
-                        dataDescriptor.specialtyBalance = 0.17
-                        dataDescriptor.operatingDayDuration = 270
-                        dataDescriptor.anesthesiaTime = 270
-                        dataDescriptor.delayWeight = dw
-                        dataDescriptor.operatingTimeDistribution = TruncatedNormalParameters(low=30,
-                                                                                                high=120,
-                                                                                                mean=60,
-                                                                                                stdDev=20)
-                        dataDescriptor.priorityDistribution = TruncatedNormalParameters(low=1,
-                                                                                        high=120,
-                                                                                        mean=60,
-                                                                                        stdDev=10)
-                        dataMaker = DataMaker(seed=52876)
-                        dataContainer = dataMaker.create_data_container(dataDescriptor)
-                        dataDictionary = dataMaker.create_data_dictionary(dataContainer, dataDescriptor, de)
-
-                        solutionLogger.info("Overall patients:\n")
-                        solutionLogger.info(dataMaker.data_as_string(dataDictionary))
-                        t = time.time()
-                        runInfo = planner.solve_model(dataDictionary)
-                        elapsed = (time.time() - t)
-
-                        solution = planner.extract_solution()
-                        sv = SolutionVisualizer()
-                        # sv.print_solution(solution)
-                        sv.plot_graph(solution)
-
-                        solutionLogger.info("\n" + sv.solution_as_string(solution))
-
-
-                        runDataLogger.info("T_" + str(de) + "_di_" + str(dw) + "_" + str(id) + "\t"
-                                        + solver + "\t"
-                                        + str(s) + "\t"
-                                        + str(c) + "\t"
-                                        + str(runInfo["Model_building_time"]) + "\t"
-                                        + str(runInfo["Solving_time"]) + "\t"
-                                        + str(round(elapsed, 2)) + "\t"
-                                        + str(runInfo["Status_OK"]) + "\t"
-                                        + str(sv.compute_solution_value(solution)) + "\t"
-                                        + str(runInfo["Time_Limit_Hit"]) + "\t"
-                                        + str(runInfo["Gap"]) + "\t"
-                                        + str(sv.count_operated_patients(solution)) + "\t"
-                                        + str(sv.compute_solution_partitioning_by_precedence(solution)) + "\t"
-                                        + str(de) + "\t"
-                                        + str(dw)
-                        )
-
-                        id += 1
+    parser = argparse.ArgumentParser(description="Run the solver x delayEstimate x delayWeight x size x covid sweep.")
+    parser.add_argument("--config", help="JSON file overriding the default grid (solvers, size, covid, delayWeights, delayEstimate, timeLimit, gap, seed, dataDescriptor)")
+    parser.add_argument("--shard", type=parse_shard, help="run only shard i of n, as i/n (1 <= i <= n); results go to " + shard_results_file("i", "n"))
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--results", help="results store (default: results.db, or the shard's own store with --shard)")
+    parser.add_argument("--cache", metavar="DIRECTORY", help="reuse generated instances from this instance cache, filling it as needed")
+    parser.add_argument("--library", metavar="DIRECTORY", help="solve the instances of this instance library (see instance_library.py) instead of the grid's size x covid x delayEstimate")
+    parser.add_argument("--merge", nargs="*", metavar="SHARD_RESULTS", help="merge shard results stores (default: results_shard_*.db) into --results and exit")
+    parser.add_argument("--dump", metavar="DIRECTORY", help="also write each cell's waiting list and schedule to this directory")
+    parser.add_argument("--dump-format", choices=["text", "tsv"], default="text", help="text: one .log per cell, as the original per-test logs; tsv: one table per waiting list and schedule")
+    parser.add_argument("--parametric", action="store_true", help="solve the cells differing only in delayWeight with one model, updated in place and warm-started from the previous cell")
+    methods = parser.add_mutually_exclusive_group()
+    methods.add_argument("--race", action="store_true", help="race the grid's solvers on each cell, keeping the first to prove optimality within the gap (or the best at the time limit)")
+    methods.add_argument("--decompose", action="store_true", help="split each instance into blocks of specialties and rooms sharing no patient or room, and solve the blocks in parallel with each of the grid's solvers")
+    parser.add_argument("--lazy", action="store_true", help="add the end-of-day and sequencing constraints only when the incumbent violates them")
+    parser.add_argument("--gantt", metavar="DIRECTORY", help="render every schedule of --results as an HTML Gantt chart in this directory and exit")
+    args = parser.parse_args()
 
-                    
+    if(args.gantt is not None):
+        written = render_schedules(args.results or "results.db", args.gantt, args.workers)
+        print("Rendered " + str(len(written)) + " schedules to " + args.gantt + ".")
+    elif(args.merge is not None):
+        inputFiles = args.merge or sorted(glob.glob("results_shard_*.db"))
+        merged = merge_results(inputFiles, args.results or "results.db")
+        print("Merged " + str(merged) + " runs from " + str(len(inputFiles)) + " stores.")
+    else:
+        grid = load_grid(args.config)
+        if(args.race):
+            solvers = [race_solver(grid["solvers"])]
+        elif(args.decompose):
+            solvers = [decomposed_solver(solver) for solver in grid["solvers"]]
+        else:
+            solvers = grid["solvers"]
+        if(args.library is not None):
+            cells = create_cells_from_library(InstanceLibrary(args.library), solvers, grid["delayWeights"])
+        else:
+            cells = create_cells(solvers, grid["delayEstimate"], grid["delayWeights"], grid["size"], grid["covid"])
+        resultsFile = args.results or "results.db"
+        if(args.shard is not None):
+            shard, shards = args.shard
+            cells = shard_cells(cells, shard, shards, args.parametric)
+            resultsFile = args.results or shard_results_file(shard, shards)
 
+        # finished cells are recorded in the results store: re-running resumes a killed sweep
+        runner = SweepRunner(resultsFile=resultsFile,
+                             workers=args.workers,
+                             plannerClass=functools.partial(SinglePhaseStartingMinutePlanner, lazy=args.lazy),
+                             timeLimit=grid["timeLimit"],
+                             gap=grid["gap"],
+                             descriptorFields=grid["dataDescriptor"],
+                             seed=grid["seed"],
+                             cacheDirectory=args.cache,
+                             dumpDirectory=args.dump,
+                             dumpFormat=args.dump_format,
+                             parametric=args.parametric)
+        runner.run(cells)
@@ -4,7 +4,7 @@ from tkinter import *
 from tkinter.ttk import *
 
 from data_maker import DataDescriptor, DataMaker, TruncatedNormalParameters
-from planners import SinglePhaseStartingMinutePlanner
+from planners import GreedyPlanner, SinglePhaseStartingMinutePlanner
 
 from utils import SolutionVisualizer
 
@@ -108,6 +108,7 @@ class MiniGUI(object):
         dataDescriptor.covidFrequence = self.covid.variable.get()
         dataDescriptor.specialtyBalance = 0.17
         dataDescriptor.operatingDayDuration = 270
+        dataDescriptor.delayWeight = 0.5
 
         dataDescriptor.priorityDistribution = TruncatedNormalParameters(low=1,
                                                                         high=120,
@@ -115,9 +116,12 @@ class MiniGUI(object):
                                                                         stdDev=10)
         dataMaker = DataMaker(seed=52876)
         dataContainer = dataMaker.create_data_container(dataDescriptor)
-        dataDictionary = dataMaker.create_data_dictionary(dataContainer, dataDescriptor)
+        dataDictionary = dataMaker.create_data_dictionary(dataContainer, dataDescriptor, "UO")
 
-        planner = SinglePhaseStartingMinutePlanner(timeLimit=self.timeLimit.value.get(), gap=self.gap.value.get()/100, solver=self.selectedSolver.get())
+        if(self.selectedMethod.get() == "greedy"):
+            planner = GreedyPlanner()
+        else:
+            planner = SinglePhaseStartingMinutePlanner(timeLimit=self.timeLimit.value.get(), gap=self.gap.value.get()/100, solver=self.selectedSolver.get())
         
         print("Patients to be operated:\n")
         dataMaker.print_data(dataDictionary)
@@ -125,9 +129,10 @@ class MiniGUI(object):
         solution = planner.extract_solution()
 
         sv = SolutionVisualizer()
+        summary = sv.solution_summary(solution)
         sv.print_solution(solution)
-        print("Objective function value: " + str(sv.compute_solution_value(solution)))
-        sv.print_patients_by_precedence(solution)
+        print("Objective function value: " + str(summary.value))
+        sv.print_partitioning(summary.partitioning_by_precedence())
         sv.plot_graph(solution)
 
     def initializeUI(self):
@@ -154,7 +159,7 @@ class MiniGUI(object):
         # solver selection combo
         self.selectedSolver = StringVar()
         self.selectedSolver.set("Select solver")
-        self.solvers = ["cplex", "cbc"]
+        self.solvers = ["cplex", "cbc", "appsi_highs"]
         self.solversComboBox = Combobox(master=self.parametersFrame,
                                         textvariable=self.selectedSolver,
                                         values=self.solvers,
@@ -173,7 +178,7 @@ class MiniGUI(object):
         # method selection combo
         self.selectedMethod = StringVar()
         self.selectedMethod.set("Select method")
-        self.methods = ["Starting Minute"]
+        self.methods = ["Starting Minute", "greedy"]
         self.methodsComboBox = Combobox(master=self.parametersFrame,
                                         textvariable=self.selectedMethod,
                                         values=self.methods,
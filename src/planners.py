@@ -1,9 +1,12 @@
 from __future__ import division
 import time
+import numpy as np
 import pyomo.environ as pyo
-from pyomo.opt import SolverStatus, TerminationCondition
+from pyomo.common.gc_manager import PauseGC
 
+from data_maker import Instance
 from model import Patient
+from solver_backends import create_solver_backend
 
 
 class Planner:
@@ -11,27 +14,11 @@ class Planner:
     def __init__(self, timeLimit, gap, solver):
         self.model = pyo.AbstractModel()
         self.modelInstance = None
-        self.solver = pyo.SolverFactory(solver)
-        if(solver == "cplex"):
-            self.solver.options['timelimit'] = timeLimit
-            if(gap is not None):
-                self.solver.options['mipgap'] = gap
-            self.solver.options['emphasis'] = "mip 2"
-            self.solver.options['mip'] = "strategy probe 3"
-            self.solver.options['mip'] = "cuts all 2"
-        if(solver == "gurobi"):
-            self.solver.options['timelimit'] = timeLimit
-            self.solver.options['mipgap'] = gap
-            self.solver.options['mipfocus'] = 2
-        if(solver == "cbc"):
-            self.solver.options['seconds'] = timeLimit
-            self.solver.options['ratiogap'] = gap
-            self.solver.options['heuristics'] = "on"
-            # self.solver.options['round'] = "on"
-            # self.solver.options['feas'] = "on"
-            self.solver.options['cuts'] = "on"
-            self.solver.options['preprocess'] = "on"
-            # self.solver.options['printingOptions'] = "normal"
+        self.concrete = False
+        self.solver = create_solver_backend(solver, timeLimit, gap)
+
+    def set_threads(self, threads):
+        self.solver.set_threads(threads)
 
     @staticmethod
     def objective_function_d_i(model):
@@ -55,24 +42,28 @@ class Planner:
     # each patient must be assigned to a room matching her specialty need
     @staticmethod
     def specialty_assignment_rule(model, j, k, t):
-        return sum(model.x[i, k, t] for i in model.i if model.specialty[i] == j) <= model.bigM[1] * model.tau[j, k, t]
+        patients = [i for i in model.i if model.specialty[i] == j]
+        # a specialty with no patient on the waiting list has nothing to keep out of the room
+        if(len(patients) == 0):
+            return pyo.Constraint.Skip
+        return sum(model.x[i, k, t] for i in patients) <= model.bigM[1] * model.tau[j, k, t]
 
     def build_common_model(self):
         self.define_common_variables_and_params()
-        self.define_common_constraints()
+        self.define_common_constraints(self.model)
 
-    def define_common_constraints(self):
-        self.model.single_surgery_constraint = pyo.Constraint(
-            self.model.i,
+    def define_common_constraints(self, model):
+        model.single_surgery_constraint = pyo.Constraint(
+            model.i,
             rule=self.single_surgery_rule)
-        self.model.surgery_time_constraint = pyo.Constraint(
-            self.model.k,
-            self.model.t,
+        model.surgery_time_constraint = pyo.Constraint(
+            model.k,
+            model.t,
             rule=self.surgery_time_rule)
-        self.model.specialty_assignment_constraint = pyo.Constraint(
-            self.model.j,
-            self.model.k,
-            self.model.t,
+        model.specialty_assignment_constraint = pyo.Constraint(
+            model.j,
+            model.k,
+            model.t,
             rule=self.specialty_assignment_rule)
 
     def define_common_variables_and_params(self):
@@ -97,51 +88,243 @@ class Planner:
         # self.model.m = pyo.Param(self.model.i)
         # self.model.l = pyo.Param(self.model.i)
         # self.model.L = pyo.Param(self.model.i)
-        self.model.r = pyo.Param(self.model.i)
-        self.model.d = pyo.Param(self.model.i)
-        self.model.s = pyo.Param(self.model.k, self.model.t)
+        # mutable, so that a built model can be updated in place (see resolve_model)
+        self.model.r = pyo.Param(self.model.i, mutable=True)
+        self.model.d = pyo.Param(self.model.i, mutable=True)
+        self.model.s = pyo.Param(self.model.k, self.model.t, mutable=True)
         # self.model.a = pyo.Param(self.model.i)
         self.model.c = pyo.Param(self.model.i)
-        self.model.u = pyo.Param(self.model.i, self.model.i)
         self.model.tau = pyo.Param(self.model.j, self.model.k, self.model.t)
         self.model.specialty = pyo.Param(self.model.i)
         self.model.precedence = pyo.Param(self.model.i)
         self.model.bigM = pyo.Param(self.model.bigMRangeSet)
 
-    def define_gamma_variables(self):
-        self.model.gamma = pyo.Var(self.model.i, domain=pyo.NonNegativeReals)
-
-    def define_objective(self):
-        self.model.objective = pyo.Objective(
+    # same components as define_common_variables_and_params, but built directly from the data dictionary
+    def define_concrete_common_variables_and_params(self, model, data):
+        model.I = pyo.Param(initialize=data['I'][None], within=pyo.NonNegativeIntegers)
+        model.J = pyo.Param(initialize=data['J'][None], within=pyo.NonNegativeIntegers)
+        model.K = pyo.Param(initialize=data['K'][None], within=pyo.NonNegativeIntegers)
+        model.T = pyo.Param(initialize=data['T'][None], within=pyo.NonNegativeIntegers)
+        model.M = pyo.Param(initialize=data['M'][None], within=pyo.NonNegativeIntegers)
+
+        model.i = pyo.RangeSet(1, data['I'][None])
+        model.j = pyo.RangeSet(1, data['J'][None])
+        model.k = pyo.RangeSet(1, data['K'][None])
+        model.t = pyo.RangeSet(1, data['T'][None])
+        model.bigMRangeSet = pyo.RangeSet(1, data['M'][None])
+
+        model.x = pyo.Var(model.i,
+                          model.k,
+                          model.t,
+                          domain=pyo.Binary)
+
+        model.p = pyo.Param(model.i, initialize=data['p'])
+        model.r = pyo.Param(model.i, initialize=data['r'], mutable=True)
+        model.d = pyo.Param(model.i, initialize=data['d'], mutable=True)
+        model.s = pyo.Param(model.k, model.t, initialize=data['s'], mutable=True)
+        model.c = pyo.Param(model.i, initialize=data['c'])
+        model.tau = pyo.Param(model.j, model.k, model.t, initialize=data['tau'])
+        model.specialty = pyo.Param(model.i, initialize=data['specialty'])
+        model.precedence = pyo.Param(model.i, initialize=data['precedence'])
+        model.bigM = pyo.Param(model.bigMRangeSet, initialize=data['bigM'])
+
+    def define_gamma_variables(self, model):
+        model.gamma = pyo.Var(model.i, domain=pyo.NonNegativeReals)
+
+    def define_objective(self, model):
+        model.objective = pyo.Objective(
             rule=self.objective_function_d_i,
             sense=pyo.maximize)
 
+    # planners take either an Instance or the nested Pyomo data dictionary
+    @staticmethod
+    def to_pyomo_data(data):
+        if(isinstance(data, Instance)):
+            return data.to_pyomo_data()
+        return data
+
     def create_model_instance(self, data):
         print("Creating model instance...")
         t = time.time()
-        self.modelInstance = self.model.create_instance(data)
+        data = self.to_pyomo_data(data)
+        if(self.concrete):
+            # create_instance pauses the garbage collector while building: do the same here
+            with PauseGC():
+                self.modelInstance = self.create_concrete_model(data)
+        else:
+            self.modelInstance = self.model.create_instance(data)
         elapsed = (time.time() - t)
         return elapsed
 
+    # planners without a ConcreteModel builder of their own build their AbstractModel instead
+    def create_concrete_model(self, data):
+        print(type(self).__name__ + " has no ConcreteModel builder: building the abstract model.")
+        self.concrete = False
+        return self.model.create_instance(data)
+
+    # initial values for x, and for y and gamma when the model has them, taken from a solution dict
+    # such as the one returned by extract_solution; fixed variables keep their values
+    def set_warm_start(self, modelInstance, solution):
+        assigned = {patient.id: (k, t, patient.order) for (k, t), patients in solution.items() for patient in patients}
+        for (i, k, t), var in modelInstance.x.items():
+            if(not var.fixed):
+                var.set_value(1 if i in assigned and assigned[i][:2] == (k, t) else 0)
+        if(modelInstance.component('gamma') is not None):
+            for i, var in modelInstance.gamma.items():
+                var.set_value(assigned[i][2] if i in assigned else 0)
+        if(modelInstance.component('y') is not None):
+            for (i1, i2, k, t), var in modelInstance.y.items():
+                if(var.fixed):
+                    continue
+                if(i1 in assigned and i2 in assigned and assigned[i1][:2] == (k, t) == assigned[i2][:2]):
+                    var.set_value(1 if (assigned[i1][2], i1) < (assigned[i2][2], i2) else 0)
+                else:
+                    var.set_value(1 if i1 < i2 else 0)
+
+    @staticmethod
+    def is_feasible(modelInstance, tolerance=1e-6):
+        for constraint in modelInstance.component_data_objects(pyo.Constraint, active=True):
+            body = pyo.value(constraint.body, exception=False)
+            if(body is None):
+                return False
+            if(constraint.has_lb() and body < pyo.value(constraint.lower) - tolerance):
+                return False
+            if(constraint.has_ub() and body > pyo.value(constraint.upper) + tolerance):
+                return False
+        return True
+
+    # returns None without a warm start, otherwise whether it is handed to the solver:
+    # the solver must support warm starts and the start must satisfy every constraint.
+    # Whether the solver then uses it is up to the solver, and is not reported
+    def apply_warm_start(self, warmStart):
+        if(warmStart is None):
+            return None
+        self.set_warm_start(self.modelInstance, warmStart)
+        if(not self.solver.warm_start_capable()):
+            print("Solver does not support warm starts: starting cold.")
+            return False
+        if(not self.is_feasible(self.modelInstance)):
+            print("Warm start violates the model's constraints: starting cold.")
+            return False
+        return True
+
+    def common_solve_model(self, modelBuildingTime, warmStartProvided=None):
+        print("Solving model instance...")
+        solveInfo = self.solver.solve(self.modelInstance, warmstart=bool(warmStartProvided))
+        print("\nModel instance solved.")
+
+        runInfo = {
+                    "Model_builder": "concrete" if self.concrete else "abstract",
+                    "Model_building_time": modelBuildingTime,
+                    "Solving_time": solveInfo["Solving_time"],
+                    "Status_OK": solveInfo["Status_OK"],
+                    "Objective_Function_Value": pyo.value(self.modelInstance.objective),
+                    "Time_Limit_Hit": solveInfo["Time_Limit_Hit"],
+                    "Gap": solveInfo["Gap"],
+                    "Optimal": solveInfo["Optimal"],
+                    "Warm_start_provided": warmStartProvided,
+                    "Solver_interface": solveInfo["Solver_interface"],
+                    "Write_time": solveInfo["Write_time"],
+                    "Load_time": solveInfo["Load_time"]
+                    }
+
+        return runInfo
+
+    # solves the built model; overridden by planners that add constraints while solving
+    def solve_model_instance(self, modelBuildingTime, warmStartProvided=None):
+        return self.common_solve_model(modelBuildingTime, warmStartProvided)
+
+    # constraints whose right-hand side is s[k, t], for the given room-days
+    def room_day_constraints(self, modelInstance, roomDays):
+        return [modelInstance.surgery_time_constraint[k, t] for (k, t) in roomDays]
+
+    # stores the new r, d and s in the built model; returns the constraints to push to the solver
+    def update_parameters(self, modelInstance, data):
+        data = self.to_pyomo_data(data)[None]
+        if((data['I'][None], data['K'][None], data['T'][None]) != (len(modelInstance.i), len(modelInstance.k), len(modelInstance.t))):
+            raise ValueError("Only r, d and s can change between parametric solves")
+        modelInstance.r.store_values(data['r'])
+        modelInstance.d.store_values(data['d'])
+        changedRoomDays = [(k, t) for (k, t), value in data['s'].items() if pyo.value(modelInstance.s[k, t]) != value]
+        for (k, t) in changedRoomDays:
+            modelInstance.s[k, t] = data['s'][(k, t)]
+        return self.room_day_constraints(modelInstance, changedRoomDays)
+
+    # solves data that differs from the last solved data only in r, d and s (e.g. another delayWeight):
+    # instead of building a new model, the last one is updated in place and re-solved from the last solution
+    def resolve_model(self, data):
+        if(self.modelInstance is None):
+            return self.solve_model(data)
+        print("Updating model instance...")
+        t = time.time()
+        warmStart = self.extract_solution()
+        self.solver.update_constraints(self.update_parameters(self.modelInstance, data))
+        modelBuildingTime = (time.time() - t)
+        warmStartProvided = self.apply_warm_start(warmStart)
+        runInfo = self.solve_model_instance(modelBuildingTime, warmStartProvided)
+        runInfo["Parametric"] = True
+        return runInfo
+
+    # the solution as parallel arrays, one entry per operated patient, sorted by room, day and start;
+    # variable and parameter values are pulled in bulk instead of one component lookup at a time
+    def common_extract_solution_arrays(self, modelInstance):
+        xValues = modelInstance.x.extract_values()
+        keys = np.array(list(xValues.keys()), dtype=int).reshape(-1, 3)
+        values = np.array([0 if value is None else value for value in xValues.values()], dtype=float)
+        patients, rooms, days = keys[np.rint(values) == 1].T
+        if(modelInstance.component('gamma') is not None):
+            gamma = modelInstance.gamma.extract_values()
+            # None for patients whose start time is in no constraint yet (see SinglePhaseStartingMinutePlanner lazy)
+            starts = np.rint([gamma[i] or 0 for i in patients.tolist()]).astype(int)
+        else:
+            starts = np.zeros(len(patients), dtype=int)
+        order = np.lexsort((patients, starts, days, rooms))
+        arrays = {"patient": patients[order], "room": rooms[order], "day": days[order], "start": starts[order]}
+        for name, param in [("operatingTime", "p"), ("priority", "r"), ("specialty", "specialty"), ("covid", "c"), ("precedence", "precedence")]:
+            paramValues = modelInstance.component(param).extract_values()
+            arrays[name] = np.array([paramValues[i] for i in arrays["patient"].tolist()])
+        return arrays
+
     def common_extract_solution(self, modelInstance):
-        dict = {}
-        for k in modelInstance.k:
-            for t in modelInstance.t:
-                patients = []
-                for i in modelInstance.i:
-                    if(round(modelInstance.x[i, k, t].value) == 1):
-                        p = modelInstance.p[i]
-                        c = modelInstance.c[i]
-                        # a = modelInstance.a[i]
-                        order = round(modelInstance.gamma[i].value)
-                        specialty = modelInstance.specialty[i]
-                        priority = modelInstance.r[i]
-                        precedence = modelInstance.precedence[i]
-                        patients.append(
-                            Patient(i, priority, k, specialty, t, p, c, precedence, None, None, order))
-                patients.sort(key=lambda x: x.order)
-                dict[(k, t)] = patients
-        return dict
+        return self.solution_from_arrays(self.common_extract_solution_arrays(modelInstance), list(modelInstance.k), list(modelInstance.t))
+
+    # dict of (k, t) -> patients, in the order of the arrays
+    @staticmethod
+    def solution_from_arrays(arrays, rooms, days):
+        solution = {(k, t): [] for k in rooms for t in days}
+        columns = [arrays[name].tolist() for name in ["patient", "priority", "room", "specialty", "day", "operatingTime", "covid", "precedence", "start"]]
+        for (i, priority, k, specialty, t, p, c, precedence, order) in zip(*columns):
+            solution[(k, t)].append(Patient(i, priority, k, specialty, t, p, c, precedence, None, None, order))
+        return solution
+
+    # array view of a dict-of-lists solution, for planners that do not build it from arrays
+    @staticmethod
+    def solution_to_arrays(solution):
+        patients = [patient for (k, t) in sorted(solution) for patient in sorted(solution[(k, t)], key=lambda patient: (patient.order, patient.id))]
+        return {"patient": np.array([patient.id for patient in patients], dtype=int),
+                "room": np.array([patient.room for patient in patients], dtype=int),
+                "day": np.array([patient.day for patient in patients], dtype=int),
+                "start": np.array([patient.order for patient in patients]),
+                "operatingTime": np.array([patient.operatingTime for patient in patients]),
+                "priority": np.array([patient.priority for patient in patients]),
+                "specialty": np.array([patient.specialty for patient in patients], dtype=int),
+                "covid": np.array([patient.covid for patient in patients], dtype=int),
+                "precedence": np.array([patient.precedence for patient in patients], dtype=int)}
+
+    def extract_solution_arrays(self):
+        return self.solution_to_arrays(self.extract_solution())
+
+    # start times implied by the precedence order: within each room-day, patients are
+    # sorted by precedence class and their operating times are stacked from minute 0
+    @staticmethod
+    def stack_by_precedence(solution):
+        for patients in solution.values():
+            patients.sort(key=lambda patient: (patient.precedence, patient.id))
+            start = 0
+            for patient in patients:
+                patient.order = start
+                start += patient.operatingTime
+        return solution
 
     def common_print_solution(self, modelInstance):
         solution = self.common_extract_solution(modelInstance)
@@ -161,129 +344,589 @@ class StartingMinutePlanner(Planner):
     # ensure gamma plus operation time does not exceed end of day
     @staticmethod
     def end_of_day_rule(model, i, k, t):
-        if(model.find_component('xParam') and model.xParam[i, k, t] == 0):
+        if(model.component('xParam') is not None and model.xParam[i, k, t] == 0):
             return pyo.Constraint.Skip
         return model.gamma[i] + model.p[i] <= model.s[k, t]
 
     # ensure that patient i1 terminates operation before i2, if y_12kt = 1
     @staticmethod
     def time_ordering_precedence_rule(model, i1, i2, k, t):
-        if(i1 == i2 or (model.find_component('xParam') and model.xParam[i1, k, t] + model.xParam[i2, k, t] < 2)):
+        if(i1 == i2 or (model.component('xParam') is not None and model.xParam[i1, k, t] + model.xParam[i2, k, t] < 2)):
             return pyo.Constraint.Skip
         return model.gamma[i1] + model.p[i1] <= model.gamma[i2] + model.bigM[5] * (3 - model.x[i1, k, t] - model.x[i2, k, t] - model.y[i1, i2, k, t])
 
+    # i1 starts before i2 if both are in (k, t) and i1 has the lower precedence class; patients of the same
+    # specialty cannot overlap either, so i1 must end before i2 starts: this is the precedence constraint
+    # with y_12kt = 1, the only value exclusive_precedence_rule leaves it, hence no y is needed for the pair
     @staticmethod
     def start_time_ordering_priority_rule(model, i1, i2, k, t):
-        if(i1 == i2 or model.u[i1, i2] == 0 or (model.find_component('xParam') and model.xParam[i1, k, t] + model.xParam[i2, k, t] < 2)):
+        if(i1 == i2 or model.precedence[i1] >= model.precedence[i2] or (model.component('xParam') is not None and model.xParam[i1, k, t] + model.xParam[i2, k, t] < 2)):
             return pyo.Constraint.Skip
-        return model.gamma[i1] * model.u[i1, i2] <= model.gamma[i2] * (1 - model.u[i2, i1]) + model.bigM[2] * (2 - model.x[i1, k, t] - model.x[i2, k, t])
+        if(model.specialty[i1] == model.specialty[i2]):
+            return model.gamma[i1] + model.p[i1] <= model.gamma[i2] + model.bigM[5] * (2 - model.x[i1, k, t] - model.x[i2, k, t])
+        return model.gamma[i1] <= model.gamma[i2] + model.bigM[2] * (2 - model.x[i1, k, t] - model.x[i2, k, t])
 
     # either i1 comes before i2 in (k, t) or i2 comes before i1 in (k, t)
     @staticmethod
     def exclusive_precedence_rule(model, i1, i2, k, t):
-        if(i1 >= i2 or (model.find_component('xParam') and model.xParam[i1, k, t] + model.xParam[i2, k, t] < 2)
+        if(i1 >= i2 or (model.component('xParam') is not None and model.xParam[i1, k, t] + model.xParam[i2, k, t] < 2)
         or(model.specialty[i1] != model.specialty[i2])):
             return pyo.Constraint.Skip
         return model.y[i1, i2, k, t] + model.y[i2, i1, k, t] == 1
 
-    def define_y_variables(self):
-        self.model.y = pyo.Var(self.model.i,
-                               self.model.i,
-                               self.model.k,
-                               self.model.t,
-                               domain=pyo.Binary)
+    # patients that may be operated in each room-day, given their specialty
+    # (or, when xParam is defined, the patients already assigned to it)
+    @staticmethod
+    def room_day_patients(model):
+        roomDayPatients = {(k, t): [] for k in model.k for t in model.t}
+        if(model.component('xParam') is not None):
+            for (i, k, t), value in model.xParam.sparse_items():
+                if(value == 1):
+                    roomDayPatients[(k, t)].append(i)
+            return {roomDay: np.array(sorted(patients), dtype=int) for roomDay, patients in roomDayPatients.items()}
+        patients = np.array(list(model.i), dtype=int)
+        specialties = np.array([model.specialty.extract_values()[i] for i in patients.tolist()], dtype=int)
+        for (j, k, t), value in model.tau.extract_values().items():
+            if(value == 1):
+                roomDayPatients[(k, t)].append(patients[specialties == j])
+        return {roomDay: np.sort(np.concatenate(groups)) if len(groups) > 0 else np.array([], dtype=int)
+                for roomDay, groups in roomDayPatients.items()}
+
+    # (i1, i2, k, t) tuples of distinct patients that may share room k on day t, and whose precedence
+    # classes compare as sign(precedence[i2] - precedence[i1]) == comparison
+    @staticmethod
+    def room_day_pairs(model, comparison):
+        precedences = model.precedence.extract_values()
+        index = []
+        for (k, t), patients in StartingMinutePlanner.room_day_patients(model).items():
+            classes = np.array([precedences[i] for i in patients.tolist()], dtype=int)
+            pairs = (np.sign(classes[None, :] - classes[:, None]) == comparison) & (patients[:, None] != patients[None, :])
+            first, second = np.nonzero(pairs)
+            index.extend(zip(patients[first].tolist(), patients[second].tolist(), [k] * len(first), [t] * len(first)))
+        return index
+
+    # y orders the pairs of the same precedence class; any other pair is ordered by its classes
+    @staticmethod
+    def y_index_rule(model):
+        return StartingMinutePlanner.room_day_pairs(model, 0)
+
+    @staticmethod
+    def priority_index_rule(model):
+        return StartingMinutePlanner.room_day_pairs(model, 1)
 
-    def define_end_of_day_constraint(self):
-        self.model.end_of_day_constraint = pyo.Constraint(
-            self.model.i,
-            self.model.k,
-            self.model.t,
+    @staticmethod
+    def exclusive_index_rule(model):
+        specialties = model.specialty.extract_values()
+        return [(i1, i2, k, t) for (i1, i2, k, t) in model.yIndex if i1 < i2 and specialties[i1] == specialties[i2]]
+
+    # sparse index sets driving y and the sequencing constraints
+    def define_sequencing_index_sets(self, model):
+        model.yIndex = pyo.Set(dimen=4, initialize=self.y_index_rule)
+        model.priorityIndex = pyo.Set(dimen=4, initialize=self.priority_index_rule)
+        model.exclusiveIndex = pyo.Set(dimen=4, initialize=self.exclusive_index_rule)
+
+    def define_y_variables(self, model):
+        model.y = pyo.Var(model.yIndex,
+                          domain=pyo.Binary)
+
+    def define_end_of_day_constraint(self, model):
+        model.end_of_day_constraint = pyo.Constraint(
+            model.i,
+            model.k,
+            model.t,
             rule=self.end_of_day_rule)
 
-    def define_priority_constraint(self):
-        self.model.priority_constraint = pyo.Constraint(
-            self.model.i,
-            self.model.i,
-            self.model.k,
-            self.model.t,
+    def define_priority_constraint(self, model):
+        model.priority_constraint = pyo.Constraint(
+            model.priorityIndex,
             rule=self.start_time_ordering_priority_rule)
 
-    def define_precedence_constraint(self):
-        self.model.precedence_constraint = pyo.Constraint(
-            self.model.i,
-            self.model.i,
-            self.model.k,
-            self.model.t,
+    def define_precedence_constraint(self, model):
+        model.precedence_constraint = pyo.Constraint(
+            model.yIndex,
             rule=self.time_ordering_precedence_rule)
 
-    def define_exclusive_precedence_constraint(self):
-        self.model.exclusive_precedence_constraint = pyo.Constraint(
-            self.model.i,
-            self.model.i,
-            self.model.k,
-            self.model.t,
+    def define_exclusive_precedence_constraint(self, model):
+        model.exclusive_precedence_constraint = pyo.Constraint(
+            model.exclusiveIndex,
             rule=self.exclusive_precedence_rule)
 
-    def fix_y_variables(self, modelInstance):
-        print("Fixing y variables...")
-        fixed = 0
-        for k in modelInstance.k:
-            for t in modelInstance.t:
-                for i1 in range(2, self.modelInstance.I + 1):
-                    for i2 in range(1, i1):
-                        if(modelInstance.u[i1, i2] == 1):
-                            modelInstance.y[i1, i2, k, t].fix(1)
-                            modelInstance.y[i2, i1, k, t].fix(0)
-                            fixed += 2
-        print(str(fixed) + " y variables fixed.")
+    def extract_solution_arrays(self):
+        return self.common_extract_solution_arrays(self.modelInstance)
+
+    def room_day_constraints(self, modelInstance, roomDays):
+        constraints = super().room_day_constraints(modelInstance, roomDays)
+        for (k, t) in roomDays:
+            constraints += [modelInstance.end_of_day_constraint[i, k, t] for i in modelInstance.i if (i, k, t) in modelInstance.end_of_day_constraint]
+        return constraints
 
 
 class SinglePhaseStartingMinutePlanner(StartingMinutePlanner):
 
-    def __init__(self, timeLimit, gap, solver):
+    # lazy: the end-of-day and sequencing rows (and the y variables) start empty; the model is solved
+    # with the assignment and capacity constraints only, and the rows the incumbent violates are added
+    # before solving again, until none is violated
+    def __init__(self, timeLimit, gap, solver, concrete=False, lazy=False):
         super().__init__(timeLimit, gap, solver)
+        self.concrete = concrete
+        self.lazy = lazy
         self.define_model()
 
     def define_model(self):
         self.build_common_model()
-        self.define_variables_and_params()
-        self.define_constraints()
-        self.define_objective()
+        self.define_sequencing_index_sets(self.model)
+        self.define_variables_and_params(self.model)
+        self.define_constraints(self.model)
+        self.define_objective(self.model)
+
+    def create_concrete_model(self, data):
+        model = pyo.ConcreteModel()
+        self.define_concrete_common_variables_and_params(model, data[None])
+        self.define_common_constraints(model)
+        self.define_sequencing_index_sets(model)
+        self.define_variables_and_params(model)
+        self.define_constraints(model)
+        self.define_objective(model)
+        return model
+
+    def define_sequencing_index_sets(self, model):
+        if(not self.lazy):
+            return super().define_sequencing_index_sets(model)
+        # filled by add_sequencing_rows
+        model.yIndex = pyo.Set(dimen=4, initialize=[])
+        model.priorityIndex = pyo.Set(dimen=4, initialize=[])
+        model.exclusiveIndex = pyo.Set(dimen=4, initialize=[])
+        model.endOfDayIndex = pyo.Set(dimen=3, initialize=[])
+
+    def define_end_of_day_constraint(self, model):
+        if(not self.lazy):
+            return super().define_end_of_day_constraint(model)
+        model.end_of_day_constraint = pyo.Constraint(
+            model.endOfDayIndex,
+            rule=self.end_of_day_rule)
+
+    def define_variables_and_params(self, model):
+        self.define_y_variables(model)
+        self.define_gamma_variables(model)
+
+    def define_constraints(self, model):
+        self.define_end_of_day_constraint(model)
+        self.define_priority_constraint(model)
+        self.define_precedence_constraint(model)
+        self.define_exclusive_precedence_constraint(model)
+
+    # end-of-day rows (i, k, t) and co-assigned pairs (i1, i2, k, t), with i1 < i2, not in the model yet
+    # and violated by the incumbent. A pair is violated when no y orders it: the lower precedence class
+    # must start first, and patients of the same specialty (tied by exclusive_precedence_rule) must not overlap
+    def violated_sequencing_rows(self, modelInstance, tolerance=1e-6):
+        gamma = {i: value or 0 for i, value in modelInstance.gamma.extract_values().items()}
+        p = modelInstance.p.extract_values()
+        s = modelInstance.s.extract_values()
+        patients = [(i, k, t) for i in modelInstance.i for (k, t) in s
+                    if gamma[i] + p[i] > s[(k, t)] + tolerance and (i, k, t) not in modelInstance.endOfDayIndex]
+
+        roomDays = {}
+        for (i, k, t), value in modelInstance.x.extract_values().items():
+            if(value is not None and value > 0.5):
+                roomDays.setdefault((k, t), []).append(i)
+        pairs = []
+        for (k, t), assigned in roomDays.items():
+            for i1 in assigned:
+                for i2 in assigned:
+                    if(i1 >= i2 or (i1, i2, k, t) in modelInstance.yIndex
+                       or (i1, i2, k, t) in modelInstance.priorityIndex or (i2, i1, k, t) in modelInstance.priorityIndex):
+                        continue
+                    first, second = sorted([i1, i2], key=lambda i: (modelInstance.precedence[i], gamma[i]))
+                    if(gamma[first] > gamma[second] + tolerance
+                       or (modelInstance.specialty[first] == modelInstance.specialty[second] and gamma[first] + p[first] > gamma[second] + tolerance)):
+                        pairs.append((i1, i2, k, t))
+        return patients, pairs
+
+    # adds the rows of the full model for these end-of-day rows and pairs; returns the new variables and constraints
+    def add_sequencing_rows(self, modelInstance, patients, pairs):
+        variables = []
+        constraints = []
+        for index in patients:
+            modelInstance.endOfDayIndex.add(index)
+            constraints.append(modelInstance.end_of_day_constraint.add(index, self.end_of_day_rule(modelInstance, *index)))
+        for (i1, i2, k, t) in pairs:
+            # pairs of different precedence classes are ordered by their classes, without y
+            if(modelInstance.precedence[i1] != modelInstance.precedence[i2]):
+                (a, b) = (i1, i2) if modelInstance.precedence[i1] < modelInstance.precedence[i2] else (i2, i1)
+                modelInstance.priorityIndex.add((a, b, k, t))
+                constraints.append(modelInstance.priority_constraint.add((a, b, k, t), self.start_time_ordering_priority_rule(modelInstance, a, b, k, t)))
+                continue
+            for (a, b) in [(i1, i2), (i2, i1)]:
+                modelInstance.yIndex.add((a, b, k, t))
+                variables.append(modelInstance.y[a, b, k, t])
+            for (a, b) in [(i1, i2), (i2, i1)]:
+                constraints.append(modelInstance.precedence_constraint.add((a, b, k, t), self.time_ordering_precedence_rule(modelInstance, a, b, k, t)))
+            if(modelInstance.specialty[i1] == modelInstance.specialty[i2]):
+                modelInstance.exclusiveIndex.add((i1, i2, k, t))
+                constraints.append(modelInstance.exclusive_precedence_constraint.add((i1, i2, k, t), self.exclusive_precedence_rule(modelInstance, i1, i2, k, t)))
+        return variables, constraints
+
+    def solve_model_instance(self, modelBuildingTime, warmStartProvided=None):
+        if(not self.lazy):
+            return self.common_solve_model(modelBuildingTime, warmStartProvided)
+        iterations = []
+        while(True):
+            runInfo = self.common_solve_model(modelBuildingTime if len(iterations) == 0 else 0, warmStartProvided)
+            iterations.append(runInfo)
+            if(not runInfo["Status_OK"]):
+                break
+            t = time.time()
+            patients, pairs = self.violated_sequencing_rows(self.modelInstance)
+            if(len(patients) + len(pairs) == 0):
+                break
+            # the objective only depends on x: if the incumbent's assignment, with start times stacked by
+            # precedence, satisfies every row of the full model, it is as good and no row is needed
+            self.set_warm_start(self.modelInstance, self.stack_by_precedence(self.extract_solution()))
+            stackedPatients, stackedPairs = self.violated_sequencing_rows(self.modelInstance)
+            if(self.is_feasible(self.modelInstance) and len(stackedPatients) + len(stackedPairs) == 0):
+                print("Iteration " + str(len(iterations)) + ": incumbent sequenced by precedence.")
+                runInfo["Model_building_time"] += (time.time() - t)
+                break
+            # otherwise add the rows violated by either
+            patients = sorted(set(patients) | set(stackedPatients))
+            pairs = sorted(set(pairs) | set(stackedPairs))
+            variables, constraints = self.add_sequencing_rows(self.modelInstance, patients, pairs)
+            self.solver.add_constraints(constraints, variables)
+            print("Iteration " + str(len(iterations)) + ": added " + str(len(constraints)) + " violated rows.")
+            warmStartProvided = None
+            runInfo["Model_building_time"] += (time.time() - t)
+
+        runInfo = dict(iterations[-1])
+        for key in ["Model_building_time", "Solving_time", "Write_time", "Load_time"]:
+            runInfo[key] = sum(iteration[key] for iteration in iterations)
+        runInfo["Time_Limit_Hit"] = any(iteration["Time_Limit_Hit"] for iteration in iterations)
+        runInfo["Warm_start_provided"] = iterations[0]["Warm_start_provided"]
+        runInfo["Lazy_iterations"] = len(iterations)
+        runInfo["Lazy_rows"] = len(self.modelInstance.end_of_day_constraint) + len(self.modelInstance.precedence_constraint) \
+            + len(self.modelInstance.priority_constraint) + len(self.modelInstance.exclusive_precedence_constraint)
+        return runInfo
+
+    def solve_model(self, data, warmStart=None):
+        modelBuildingTime = self.create_model_instance(data)
+        warmStartProvided = self.apply_warm_start(warmStart)
+        return self.solve_model_instance(modelBuildingTime, warmStartProvided)
+
+    def extract_solution(self):
+        return super().common_extract_solution(self.modelInstance)
+
+
+# precedence classes are totally ordered, so once x is fixed the start times
+# inside each room-day are determined: solve only the assignment (multiple knapsack) part
+class AssignmentStartingMinutePlanner(Planner):
+
+    def __init__(self, timeLimit, gap, solver, concrete=False):
+        super().__init__(timeLimit, gap, solver)
+        self.concrete = concrete
+        self.define_model()
 
-    def define_variables_and_params(self):
-        self.define_y_variables()
-        self.define_gamma_variables()
+    def define_model(self):
+        self.build_common_model()
+        self.define_objective(self.model)
 
-    def define_constraints(self):
-        self.define_end_of_day_constraint()
-        self.define_priority_constraint()
-        self.define_precedence_constraint()
-        self.define_exclusive_precedence_constraint()
+    def create_concrete_model(self, data):
+        model = pyo.ConcreteModel()
+        self.define_concrete_common_variables_and_params(model, data[None])
+        self.define_common_constraints(model)
+        self.define_objective(model)
+        return model
 
-    def solve_model(self, data):
+    def solve_model(self, data, warmStart=None):
         modelBuildingTime = self.create_model_instance(data)
-        self.fix_y_variables(self.modelInstance)
-        print("Solving model instance...")
-        self.model.results = self.solver.solve(self.modelInstance, tee=True)
-        solvingTime = self.solver._last_solve_time
-        print("\nModel instance solved.")
-        print(self.model.results)
+        warmStartProvided = self.apply_warm_start(warmStart)
+        return self.common_solve_model(modelBuildingTime, warmStartProvided)
+
+    def extract_solution(self):
+        return self.stack_by_precedence(super().common_extract_solution(self.modelInstance))
+
+
+# patients with the same operating time, specialty and precedence class are interchangeable in
+# the assignment model: count how many patients of each class go to each room-day (z), then take
+# the patients of each class by decreasing priority x delay weight. The patients of a class with
+# the same weight form a group, and q[c, g] counts the operated patients of the g-th group of class c;
+# weights decrease with g, so the optimum takes the best patients first and the objective is the
+# assignment model's. Groups, unlike patients, are bounded by the distinct weights, not by I.
+# Start times follow the precedence order, as in AssignmentStartingMinutePlanner
+class ClassAggregationPlanner(Planner):
+
+    # priorityBandWidth also splits classes by priority // priorityBandWidth
+    def __init__(self, timeLimit, gap, solver, priorityBandWidth=None):
+        super().__init__(timeLimit, gap, solver)
+        self.concrete = True
+        self.priorityBandWidth = priorityBandWidth
+        self.instance = None
+        # patient positions (i - 1) of each class, by decreasing weight
+        self.classMembers = None
+
+    @staticmethod
+    def class_count_rule(model, c):
+        return sum(model.z[c, k, t] for (k, t) in model.classRoomDays[c]) == sum(model.q[c, g] for g in range(1, model.groups[c] + 1))
+
+    @staticmethod
+    def class_surgery_time_rule(model, k, t):
+        # no class can use the room-day
+        if(len(model.roomDayClasses[k, t]) == 0):
+            return pyo.Constraint.Skip
+        return sum(model.p[c] * model.z[c, k, t] for c in model.roomDayClasses[k, t]) <= model.s[k, t]
+
+    @staticmethod
+    def class_objective_function(model):
+        return sum(model.w[c, g] * model.q[c, g] for (c, g) in model.qIndex)
+
+    def create_classes(self, instance):
+        weights = instance.priorities * instance.delayWeights
+        keys = [instance.operatingTimes, instance.specialties, instance.precedences]
+        if(self.priorityBandWidth is not None):
+            keys.append(instance.priorities // self.priorityBandWidth)
+        _, classOf = np.unique(np.stack(keys, axis=1), axis=0, return_inverse=True)
+        classOf = classOf.ravel()
+        order = np.lexsort((-weights, classOf))
+        boundaries = np.flatnonzero(np.diff(classOf[order])) + 1
+        return np.split(order, boundaries)
+
+    def create_class_model(self, instance):
+        members = self.classMembers
+        weights = instance.priorities * instance.delayWeights
+        model = pyo.ConcreteModel()
+        model.classes = pyo.RangeSet(1, len(members))
+        model.k = pyo.RangeSet(1, instance.K)
+        model.t = pyo.RangeSet(1, instance.T)
+        model.n = pyo.Param(model.classes, initialize={c: len(members[c - 1]) for c in model.classes})
+        model.p = pyo.Param(model.classes, initialize={c: instance.operatingTimes[members[c - 1][0]].item() for c in model.classes})
+        model.s = pyo.Param(model.k, model.t, initialize={(k, t): instance.operatingRoomTimes[k - 1, t - 1].item() for k in model.k for t in model.t})
+
+        # room-days open to the class's specialty, also by class and by room-day for the constraints
+        zIndex = [(c, k, t) for c in model.classes for k in model.k for t in model.t
+                  if instance.tau[instance.specialties[members[c - 1][0]] - 1, k - 1, t - 1] == 1]
+        classRoomDays = {c: [] for c in model.classes}
+        roomDayClasses = {(k, t): [] for k in model.k for t in model.t}
+        for (c, k, t) in zIndex:
+            classRoomDays[c].append((k, t))
+            roomDayClasses[(k, t)].append(c)
+        model.zIndex = pyo.Set(dimen=3, initialize=zIndex)
+        model.classRoomDays = pyo.Set(model.classes, dimen=2, initialize=classRoomDays)
+        model.roomDayClasses = pyo.Set(model.k, model.t, initialize=roomDayClasses)
+
+        # runs of equal weight among the class's patients, which are sorted by decreasing weight
+        groupWeights = {}
+        groupSizes = {}
+        groups = {}
+        for c in model.classes:
+            classWeights = weights[members[c - 1]]
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(classWeights)) + 1))
+            sizes = np.diff(np.append(starts, len(classWeights)))
+            groups[c] = len(starts)
+            for g, (start, size) in enumerate(zip(starts.tolist(), sizes.tolist())):
+                groupWeights[(c, g + 1)] = classWeights[start].item()
+                groupSizes[(c, g + 1)] = size
+        model.qIndex = pyo.Set(dimen=2, initialize=list(groupWeights))
+        model.groups = pyo.Param(model.classes, initialize=groups)
+        model.w = pyo.Param(model.qIndex, initialize=groupWeights)
+        model.z = pyo.Var(model.zIndex, domain=pyo.NonNegativeIntegers,
+                          bounds=lambda model, c, k, t: (0, min(model.n[c], model.s[k, t] // model.p[c])))
+        model.q = pyo.Var(model.qIndex, bounds=lambda model, c, g: (0, groupSizes[(c, g)]))
+
+        model.class_count_constraint = pyo.Constraint(model.classes, rule=self.class_count_rule)
+        model.surgery_time_constraint = pyo.Constraint(model.k, model.t, rule=self.class_surgery_time_rule)
+        model.objective = pyo.Objective(rule=self.class_objective_function, sense=pyo.maximize)
+        return model
+
+    # warmStart is accepted for interface compatibility only
+    def solve_model(self, data, warmStart=None):
+        print("Creating model instance...")
+        t = time.time()
+        self.instance = data if isinstance(data, Instance) else Instance.from_pyomo_data(data)
+        self.classMembers = self.create_classes(self.instance)
+        print(str(self.instance.I) + " patients in " + str(len(self.classMembers)) + " classes.")
+        with PauseGC():
+            self.modelInstance = self.create_class_model(self.instance)
+        modelBuildingTime = (time.time() - t)
+        runInfo = self.common_solve_model(modelBuildingTime)
+        runInfo["Classes"] = len(self.classMembers)
+        return runInfo
+
+    # the classes' weights, and the order of their patients, depend on d: the class model is rebuilt
+    def resolve_model(self, data):
+        return self.solve_model(data)
+
+    def extract_solution(self):
+        instance = self.instance
+        solution = {(k, t): [] for k in self.modelInstance.k for t in self.modelInstance.t}
+        taken = [0] * len(self.classMembers)
+        for (c, k, t) in self.modelInstance.zIndex:
+            count = round(self.modelInstance.z[c, k, t].value)
+            for idx in self.classMembers[c - 1][taken[c - 1]:taken[c - 1] + count]:
+                solution[(k, t)].append(
+                    Patient(int(idx) + 1, instance.priorities[idx].item(), k, instance.specialties[idx].item(), t, instance.operatingTimes[idx].item(),
+                            instance.covidFlags[idx].item(), instance.precedences[idx].item(), None, None, 0))
+            taken[c - 1] += count
+        return self.stack_by_precedence(solution)
+
+
+# phase 1 solves the assignment only; phase 2 sequences the chosen patients, with xParam
+# restricting the sequencing model to the room-day pairs selected in phase 1
+class TwoPhaseStartingMinutePlanner(StartingMinutePlanner):
+
+    def __init__(self, timeLimit, gap, solver, concrete=False):
+        super().__init__(timeLimit, gap, solver)
+        self.concrete = concrete
+        self.assignmentPlanner = AssignmentStartingMinutePlanner(timeLimit, gap, solver, concrete)
+        self.define_model()
+
+    def define_model(self):
+        self.build_common_model()
+        self.model.xParam = pyo.Param(self.model.i, self.model.k, self.model.t, default=0)
+        self.define_sequencing_index_sets(self.model)
+        self.define_variables_and_params(self.model)
+        self.define_constraints(self.model)
+        self.define_objective(self.model)
+
+    def create_concrete_model(self, data):
+        model = pyo.ConcreteModel()
+        self.define_concrete_common_variables_and_params(model, data[None])
+        model.xParam = pyo.Param(model.i, model.k, model.t, initialize=data[None]['xParam'], default=0)
+        self.define_common_constraints(model)
+        self.define_sequencing_index_sets(model)
+        self.define_variables_and_params(model)
+        self.define_constraints(model)
+        self.define_objective(model)
+        return model
+
+    def define_variables_and_params(self, model):
+        self.define_y_variables(model)
+        self.define_gamma_variables(model)
+
+    def define_constraints(self, model):
+        self.define_end_of_day_constraint(model)
+        self.define_priority_constraint(model)
+        self.define_precedence_constraint(model)
+        self.define_exclusive_precedence_constraint(model)
+
+    def set_threads(self, threads):
+        super().set_threads(threads)
+        self.assignmentPlanner.set_threads(threads)
+
+    def fix_x_variables(self, modelInstance):
+        for (i, k, t) in modelInstance.x:
+            modelInstance.x[i, k, t].fix(modelInstance.xParam[i, k, t])
+        self.solver.update_variables(modelInstance.x.values())
+
+    def solve_model(self, data, warmStart=None):
+        data = self.to_pyomo_data(data)
+        print("Phase 1: assignment")
+        phaseOneRunInfo = self.assignmentPlanner.solve_model(data, warmStart)
+        return self.solve_phase_two(data, phaseOneRunInfo)
+
+    # the assignment model is re-solved in place; the sequencing model depends on the assignment and is rebuilt
+    def resolve_model(self, data):
+        data = self.to_pyomo_data(data)
+        print("Phase 1: assignment")
+        phaseOneRunInfo = self.assignmentPlanner.resolve_model(data)
+        return self.solve_phase_two(data, phaseOneRunInfo)
+
+    def solve_phase_two(self, data, phaseOneRunInfo):
+        assignment = self.assignmentPlanner.modelInstance.x
+        xParam = {(i, k, t): 1 for (i, k, t) in assignment if round(assignment[i, k, t].value) == 1}
+
+        print("Phase 2: sequencing")
+        phaseTwoData = {None: dict(data[None], xParam=xParam)}
+        modelBuildingTime = self.create_model_instance(phaseTwoData)
+        self.fix_x_variables(self.modelInstance)
+        phaseTwoRunInfo = self.common_solve_model(modelBuildingTime)
+
+        runInfo = {
+                    "Model_builder": phaseTwoRunInfo["Model_builder"],
+                    "Model_building_time": phaseOneRunInfo["Model_building_time"] + phaseTwoRunInfo["Model_building_time"],
+                    "Solving_time": phaseOneRunInfo["Solving_time"] + phaseTwoRunInfo["Solving_time"],
+                    "Status_OK": phaseOneRunInfo["Status_OK"] and phaseTwoRunInfo["Status_OK"],
+                    "Objective_Function_Value": phaseTwoRunInfo["Objective_Function_Value"],
+                    "Time_Limit_Hit": phaseOneRunInfo["Time_Limit_Hit"] or phaseTwoRunInfo["Time_Limit_Hit"],
+                    "Gap": phaseOneRunInfo["Gap"],
+                    "Optimal": phaseOneRunInfo["Optimal"] and phaseTwoRunInfo["Optimal"],
+                    "Warm_start_provided": phaseOneRunInfo["Warm_start_provided"],
+                    "Solver_interface": phaseTwoRunInfo["Solver_interface"],
+                    "Write_time": phaseOneRunInfo["Write_time"] + phaseTwoRunInfo["Write_time"],
+                    "Load_time": phaseOneRunInfo["Load_time"] + phaseTwoRunInfo["Load_time"]
+                    }
+        for phase, phaseRunInfo in [(1, phaseOneRunInfo), (2, phaseTwoRunInfo)]:
+            runInfo["Phase_" + str(phase) + "_Model_building_time"] = phaseRunInfo["Model_building_time"]
+            runInfo["Phase_" + str(phase) + "_Solving_time"] = phaseRunInfo["Solving_time"]
+            runInfo["Phase_" + str(phase) + "_Status_OK"] = phaseRunInfo["Status_OK"]
+        if("Parametric" in phaseOneRunInfo):
+            runInfo["Parametric"] = phaseOneRunInfo["Parametric"]
+        return runInfo
+
+    def extract_solution(self):
+        return super().common_extract_solution(self.modelInstance)
+
+
+# constructive heuristic with the same interface as the MIP planners: patients are taken by
+# decreasing priority x delay weight and put in the earliest room-day of their specialty with
+# enough time left; start times then follow the precedence order, as in AssignmentStartingMinutePlanner
+class GreedyPlanner:
+
+    def __init__(self, timeLimit=None, gap=None, solver=None):
+        self.solution = None
+
+    def set_threads(self, threads):
+        pass
+
+    # warmStart is accepted for interface compatibility only
+    def solve_model(self, data, warmStart=None):
+        t = time.time()
+        instance = data if isinstance(data, Instance) else Instance.from_pyomo_data(data)
+        I, K, T = instance.I, instance.K, instance.T
+        patients = np.arange(1, I + 1)
+        p = instance.operatingTimes.astype(float)
+        weights = (instance.priorities * instance.delayWeights).astype(float)
+        specialties = instance.specialties.astype(int)
+        # room-days are flattened day-major, so that earlier days are filled first
+        remaining = instance.operatingRoomTimes.T.flatten().astype(float)
+        allowed = instance.tau.transpose(0, 2, 1).reshape(instance.J, T * K) == 1
+        modelBuildingTime = (time.time() - t)
+
+        t = time.time()
+        roomDay = np.full(I, -1)
+        for idx in np.argsort(-weights, kind="stable"):
+            fits = allowed[specialties[idx] - 1] & (remaining >= p[idx])
+            candidate = fits.argmax()
+            if(fits[candidate]):
+                roomDay[idx] = candidate
+                remaining[candidate] -= p[idx]
+        solvingTime = (time.time() - t)
+
+        self.solution = {(k, t): [] for k in range(1, K + 1) for t in range(1, T + 1)}
+        for idx in np.flatnonzero(roomDay >= 0):
+            i = int(patients[idx])
+            t = int(roomDay[idx]) // K + 1
+            k = int(roomDay[idx]) % K + 1
+            self.solution[(k, t)].append(
+                Patient(i, instance.priorities[idx].item(), k, instance.specialties[idx].item(), t, instance.operatingTimes[idx].item(),
+                        instance.covidFlags[idx].item(), instance.precedences[idx].item(), None, None, 0))
+        Planner.stack_by_precedence(self.solution)
 
-        statusOk = self.model.results and self.model.results.solver.status == SolverStatus.ok
-        timeLimitHit = self.model.results.solver.termination_condition in [TerminationCondition.maxTimeLimit]
-        gap = 0
-        if(not (self.solver._gap is None and self.solver._best_bound is None)):
-            gap = round(self.solver._gap / self.solver._best_bound * 100, 2)
         runInfo = {
+                    "Model_builder": "greedy",
                     "Model_building_time": modelBuildingTime,
                     "Solving_time": solvingTime,
-                    "Status_OK": statusOk,
-                    "Objective_Function_Value": pyo.value(self.modelInstance.objective),
-                    "Time_Limit_Hit": timeLimitHit,
-                    "Gap": gap
+                    "Status_OK": True,
+                    "Objective_Function_Value": float(weights[roomDay >= 0].sum()),
+                    "Time_Limit_Hit": False,
+                    "Gap": None,
+                    "Optimal": False,
+                    "Warm_start_provided": None
                     }
-        
         return runInfo
 
+    def resolve_model(self, data):
+        return self.solve_model(data)
+
     def extract_solution(self):
-        return super().common_extract_solution(self.modelInstance)
+        return self.solution
+
+    def extract_solution_arrays(self):
+        return Planner.solution_to_arrays(self.solution)
@@ -0,0 +1,250 @@
+import sqlite3
+import time
+
+import pandas as pd
+
+from data_maker import Instance
+
+# runInfo keys with their own column in runs; any other runInfo key goes to run_info
+RUN_INFO_COLUMNS = {
+    "Model_builder": "model_builder",
+    "Model_building_time": "model_building_time",
+    "Solving_time": "solving_time",
+    "Status_OK": "status_ok",
+    "Objective_Function_Value": "objective_function_value",
+    "Time_Limit_Hit": "time_limit_hit",
+    "Gap": "gap"
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    test_id TEXT NOT NULL,
+    solver TEXT NOT NULL,
+    patients INTEGER,
+    covid_frequency REAL,
+    delay_estimation TEXT,
+    delay_weight REAL,
+    model_builder TEXT,
+    model_building_time REAL,
+    solving_time REAL,
+    overall_time REAL,
+    status_ok INTEGER,
+    objective_function_value REAL,
+    time_limit_hit INTEGER,
+    gap REAL,
+    solution_value REAL,
+    selected_patients INTEGER,
+    PRIMARY KEY (test_id, solver)
+);
+CREATE TABLE IF NOT EXISTS run_info (
+    test_id TEXT NOT NULL,
+    solver TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value NUMERIC,
+    PRIMARY KEY (test_id, solver, key)
+);
+CREATE TABLE IF NOT EXISTS precedence_counts (
+    test_id TEXT NOT NULL,
+    solver TEXT NOT NULL,
+    precedence INTEGER NOT NULL,
+    patients INTEGER,
+    PRIMARY KEY (test_id, solver, precedence)
+);
+CREATE TABLE IF NOT EXISTS room_days (
+    test_id TEXT NOT NULL,
+    solver TEXT NOT NULL,
+    room INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    used_minutes REAL,
+    idle_minutes REAL,
+    utilisation REAL,
+    PRIMARY KEY (test_id, solver, room, day)
+);
+CREATE TABLE IF NOT EXISTS specialty_totals (
+    test_id TEXT NOT NULL,
+    solver TEXT NOT NULL,
+    specialty INTEGER NOT NULL,
+    patients INTEGER,
+    minutes REAL,
+    value REAL,
+    PRIMARY KEY (test_id, solver, specialty)
+);
+CREATE TABLE IF NOT EXISTS waiting_lists (
+    test_id TEXT NOT NULL,
+    solver TEXT NOT NULL,
+    patient_id INTEGER NOT NULL,
+    priority REAL,
+    specialty INTEGER,
+    operating_time REAL,
+    covid INTEGER,
+    precedence INTEGER,
+    PRIMARY KEY (test_id, solver, patient_id)
+);
+CREATE TABLE IF NOT EXISTS schedules (
+    test_id TEXT NOT NULL,
+    solver TEXT NOT NULL,
+    patient_id INTEGER NOT NULL,
+    room INTEGER,
+    day INTEGER,
+    start REAL,
+    operating_time REAL,
+    priority REAL,
+    specialty INTEGER,
+    covid INTEGER,
+    precedence INTEGER,
+    PRIMARY KEY (test_id, solver, patient_id)
+);
+"""
+
+TABLE_COLUMNS = {
+    "runs": 16,
+    "run_info": 4,
+    "precedence_counts": 4,
+    "room_days": 7,
+    "specialty_totals": 6,
+    "waiting_lists": 8,
+    "schedules": 11
+}
+
+
+def to_sql_value(value):
+    if(isinstance(value, bool)):
+        return int(value)
+    if(value is None or isinstance(value, (int, float, str))):
+        return value
+    # numpy scalars and the like
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class ResultsStore:
+    """SQLite store for sweep results: one row per run in runs, plus the run's extra runInfo entries,
+    selected patients by precedence, waiting list and schedule. All writes go through an in-memory
+    buffer that is flushed every bufferSize runs or flushInterval seconds, and on close."""
+
+    def __init__(self, path="results.db", bufferSize=20, flushInterval=10):
+        self.path = path
+        self.bufferSize = bufferSize
+        self.flushInterval = flushInterval
+        # sweep workers write their runs' patient rows to the same file (see write_patient_rows)
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.executescript(SCHEMA)
+        self.buffer = {table: [] for table in TABLE_COLUMNS}
+        self.bufferedRuns = 0
+        self.lastFlush = time.time()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    # waiting_list_rows and schedule_rows yield one row at a time
+    @staticmethod
+    def waiting_list_rows(data):
+        if(isinstance(data, Instance)):
+            return zip(range(1, data.I + 1), data.priorities.tolist(), data.specialties.tolist(), data.operatingTimes.tolist(),
+                       data.covidFlags.tolist(), data.precedences.tolist())
+        data = data[None]
+        return ((i, data['r'][i], data['specialty'][i], data['p'][i], data['c'][i], data['precedence'][i])
+                for i in range(1, data['I'][None] + 1))
+
+    @staticmethod
+    def schedule_rows(solution):
+        return ((patient.id, k, t, patient.order, patient.operatingTime, patient.priority, patient.specialty, patient.covid, patient.precedence)
+                for (k, t), patients in solution.items() for patient in patients)
+
+    # unbuffered: streams a run's waiting list and schedule straight into the file, so a sweep worker
+    # can record them without sending them to the process that holds the buffered store
+    def write_patient_rows(self, cell, waitingList=(), schedule=()):
+        key = (cell["testId"], cell["solver"])
+        with self.connection:
+            for table, rows in [("waiting_lists", waitingList), ("schedules", schedule)]:
+                placeholders = ", ".join(["?"] * TABLE_COLUMNS[table])
+                self.connection.executemany("INSERT OR REPLACE INTO " + table + " VALUES (" + placeholders + ")",
+                                            (key + tuple(to_sql_value(value) for value in row) for row in rows))
+
+    def add_run(self, cell, runInfo, overallTime, solutionValue, selectedPatients, partitioning, waitingList=(), schedule=(), roomDays=(), specialties=()):
+        key = (cell["testId"], cell["solver"])
+        self.buffer["runs"].append(key + (cell["patients"], cell["covid"], cell["delayEstimate"], cell["delayWeight"],
+                                          runInfo.get("Model_builder"),
+                                          runInfo.get("Model_building_time"),
+                                          runInfo.get("Solving_time"),
+                                          overallTime,
+                                          runInfo.get("Status_OK"),
+                                          runInfo.get("Objective_Function_Value"),
+                                          runInfo.get("Time_Limit_Hit"),
+                                          runInfo.get("Gap"),
+                                          solutionValue,
+                                          selectedPatients))
+        for name, value in runInfo.items():
+            if(name not in RUN_INFO_COLUMNS):
+                self.buffer["run_info"].append(key + (name, value))
+        for precedence, patients in enumerate(partitioning):
+            self.buffer["precedence_counts"].append(key + (precedence + 1, patients))
+        self.buffer["room_days"].extend(key + tuple(row) for row in roomDays)
+        self.buffer["specialty_totals"].extend(key + tuple(row) for row in specialties)
+        self.buffer["waiting_lists"].extend(key + tuple(row) for row in waitingList)
+        self.buffer["schedules"].extend(key + tuple(row) for row in schedule)
+
+        self.bufferedRuns += 1
+        if(self.bufferedRuns >= self.bufferSize or time.time() - self.lastFlush >= self.flushInterval):
+            self.flush()
+
+    def flush(self):
+        with self.connection:
+            for table, rows in self.buffer.items():
+                if(len(rows) == 0):
+                    continue
+                placeholders = ", ".join(["?"] * TABLE_COLUMNS[table])
+                self.connection.executemany("INSERT OR REPLACE INTO " + table + " VALUES (" + placeholders + ")",
+                                            [tuple(to_sql_value(value) for value in row) for row in rows])
+                rows.clear()
+        self.bufferedRuns = 0
+        self.lastFlush = time.time()
+
+    def close(self):
+        if(self.connection is None):
+            return
+        self.flush()
+        self.connection.close()
+        self.connection = None
+
+    # (test id, solver) pairs already stored
+    def completed_cells(self):
+        self.flush()
+        return set(self.connection.execute("SELECT test_id, solver FROM runs").fetchall())
+
+    def query(self, sql, params=()):
+        self.flush()
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+    # rows of runs; keyword arguments filter on its columns, e.g. runs(solver="cplex", delay_estimation="UO")
+    def runs(self, **filters):
+        conditions = " AND ".join(column + " = ?" for column in filters)
+        sql = "SELECT * FROM runs" + (" WHERE " + conditions if conditions else "") + " ORDER BY test_id, solver"
+        return self.query(sql, tuple(to_sql_value(value) for value in filters.values()))
+
+    def schedule(self, testId, solver):
+        return self.query("SELECT * FROM schedules WHERE test_id = ? AND solver = ? ORDER BY day, room, start",
+                          (testId, solver))
+
+    # copy every row of the given stores into this one; rows already present are kept
+    def merge(self, paths):
+        self.flush()
+        merged = 0
+        for path in paths:
+            self.connection.execute("ATTACH DATABASE ? AS shard", (path,))
+            with self.connection:
+                shardTables = {row[0] for row in self.connection.execute("SELECT name FROM shard.sqlite_master WHERE type = 'table'")}
+                for table in TABLE_COLUMNS:
+                    # stores written before a table existed simply lack it
+                    if(table not in shardTables):
+                        continue
+                    cursor = self.connection.execute("INSERT OR IGNORE INTO " + table + " SELECT * FROM shard." + table)
+                    if(table == "runs"):
+                        merged += cursor.rowcount
+            self.connection.execute("DETACH DATABASE shard")
+        return merged
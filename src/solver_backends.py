@@ -0,0 +1,285 @@
+import time
+
+import pyomo.environ as pyo
+from pyomo.common.collections import ComponentSet
+from pyomo.common.timing import HierarchicalTimer
+import pyomo.contrib.appsi as appsi
+import pyomo.contrib.appsi.solvers
+from pyomo.opt import SolverStatus, TerminationCondition
+from pyomo.opt.solver import SystemCallSolver
+
+
+def create_solver_backend(solver, timeLimit, gap):
+    """Backend for a solver name: "appsi_<name>" (highs, cplex, gurobi, cbc) for the APPSI
+    interfaces, "<name>_persistent" for Pyomo's persistent plugins, anything else (cplex, gurobi,
+    cbc, or the in-memory "<name>_direct" plugins) through pyo.SolverFactory."""
+    if(solver.startswith("appsi_")):
+        return AppsiBackend(solver, timeLimit, gap)
+    if(solver.endswith("_persistent")):
+        return PersistentBackend(solver, timeLimit, gap)
+    return SolverFactoryBackend(solver, timeLimit, gap)
+
+
+# solve() of every backend returns these keys; times are in seconds:
+# Write_time to hand the model to the solver, Solving_time in the solver, Load_time to read the solution back.
+# Optimal is the solver's own proof of optimality (within the gap); Status_OK only means a solution was found
+def solve_info(interface, writeTime, solvingTime, loadTime, statusOk, timeLimitHit, gap, optimal):
+    return {"Solver_interface": interface,
+            "Write_time": writeTime,
+            "Solving_time": solvingTime,
+            "Load_time": loadTime,
+            "Status_OK": statusOk,
+            "Time_Limit_Hit": timeLimitHit,
+            "Gap": gap,
+            "Optimal": optimal}
+
+
+def relative_gap(bestObjective, bestBound):
+    if(bestObjective is None or bestBound is None or bestObjective == 0):
+        return 0
+    return round(abs(bestBound - bestObjective) / abs(bestObjective) * 100, 2)
+
+
+class SolverFactoryBackend:
+    """pyo.SolverFactory(solver). With the shell interfaces every solve writes the whole model to
+    a file, runs the solver and parses its results back; the direct interfaces translate the model
+    in memory instead, still from scratch on every solve."""
+
+    def __init__(self, solver, timeLimit, gap):
+        self.name = solver
+        self.solver = pyo.SolverFactory(solver)
+        self.results = None
+        self.set_options(timeLimit, gap)
+
+        # OptSolver.solve writes (or translates) the model in _presolve, runs the solver in
+        # _apply_solver and reads the results in _postsolve: time each step
+        self.timings = {}
+        for method, step in [("_presolve", "write"), ("_apply_solver", "solve")]:
+            if(hasattr(self.solver, method)):
+                setattr(self.solver, method, self.timed(getattr(self.solver, method), step))
+
+    def set_options(self, timeLimit, gap):
+        baseName = self.name.replace("_direct", "")
+        if(baseName == "cplex"):
+            self.solver.options['timelimit'] = timeLimit
+            if(gap is not None):
+                self.solver.options['mipgap'] = gap
+            if(self.name == "cplex"):
+                self.solver.options['emphasis'] = "mip 2"
+                self.solver.options['mip'] = "strategy probe 3"
+                self.solver.options['mip'] = "cuts all 2"
+            else:
+                self.solver.options['emphasis_mip'] = 2
+                self.solver.options['mip_strategy_probe'] = 3
+        if(baseName == "gurobi"):
+            self.solver.options['timelimit'] = timeLimit
+            self.solver.options['mipgap'] = gap
+            self.solver.options['mipfocus'] = 2
+        if(baseName == "cbc"):
+            self.solver.options['seconds'] = timeLimit
+            self.solver.options['ratiogap'] = gap
+            self.solver.options['heuristics'] = "on"
+            # self.solver.options['round'] = "on"
+            # self.solver.options['feas'] = "on"
+            self.solver.options['cuts'] = "on"
+            self.solver.options['preprocess'] = "on"
+            # self.solver.options['printingOptions'] = "normal"
+
+    def timed(self, method, step):
+        def timedMethod(*args, **kwargs):
+            t = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.timings[step] = self.timings.get(step, 0) + (time.time() - t)
+        return timedMethod
+
+    # every supported solver (cplex, gurobi, cbc) takes the thread count as 'threads'
+    def set_threads(self, threads):
+        self.solver.options['threads'] = threads
+
+    def warm_start_capable(self):
+        return self.solver.warm_start_capable()
+
+    # the whole model is sent on every solve: changed or new constraints need no pushing
+    def update_constraints(self, constraints):
+        pass
+
+    def add_constraints(self, constraints, variables=()):
+        pass
+
+    def update_variables(self, variables):
+        pass
+
+    def solve(self, model, warmstart=False, tee=True):
+        self.timings = {}
+        t = time.time()
+        if(warmstart):
+            self.results = self.solver.solve(model, tee=tee, warmstart=True)
+        else:
+            self.results = self.solver.solve(model, tee=tee)
+        elapsed = (time.time() - t)
+        print(self.results)
+
+        writeTime = self.timings.get("write", 0)
+        # plugins that are not OptSolvers are timed as a whole
+        runTime = self.timings.get("solve", elapsed - writeTime)
+        loadTime = max(0, elapsed - writeTime - runTime)
+        # the solver's own figure when it reports one
+        solvingTime = getattr(self.solver, "_last_solve_time", None) or runTime
+        statusOk = self.results and self.results.solver.status == SolverStatus.ok
+        timeLimitHit = self.results.solver.termination_condition in [TerminationCondition.maxTimeLimit]
+        gap = 0
+        if(not (getattr(self.solver, "_gap", None) is None and getattr(self.solver, "_best_bound", None) is None)):
+            gap = round(self.solver._gap / self.solver._best_bound * 100, 2)
+        optimal = bool(statusOk) and self.results.solver.termination_condition == TerminationCondition.optimal
+        return solve_info(self.interface(), writeTime, solvingTime, loadTime, statusOk, timeLimitHit, gap, optimal)
+
+    def interface(self):
+        if(isinstance(self.solver, SystemCallSolver)):
+            return "shell"
+        if(self.name.endswith("_direct")):
+            return "direct"
+        return "solver_factory"
+
+
+class PersistentBackend(SolverFactoryBackend):
+    """Pyomo's persistent plugins (cplex_persistent, gurobi_persistent): the model is loaded into
+    the solver once. Re-solving the same model only pushes the objective and the variables and
+    constraints reported changed with update_variables and update_constraints."""
+
+    def __init__(self, solver, timeLimit, gap):
+        super().__init__(solver, timeLimit, gap)
+        self.model = None
+        # variables whose bounds or fixing changed since the last solve
+        self.changedVariables = ComponentSet()
+
+    def set_options(self, timeLimit, gap):
+        if(self.name == "cplex_persistent"):
+            self.solver.options['timelimit'] = timeLimit
+            if(gap is not None):
+                self.solver.options['mip_tolerances_mipgap'] = gap
+            self.solver.options['emphasis_mip'] = 2
+            self.solver.options['mip_strategy_probe'] = 3
+        if(self.name == "gurobi_persistent"):
+            self.solver.options['TimeLimit'] = timeLimit
+            if(gap is not None):
+                self.solver.options['MIPGap'] = gap
+            self.solver.options['MIPFocus'] = 2
+
+    def update_constraints(self, constraints):
+        for constraint in constraints:
+            self.solver.remove_constraint(constraint)
+            self.solver.add_constraint(constraint)
+
+    # warm start values are read from the model at solve time: only bounds and fixings need pushing
+    def update_variables(self, variables):
+        self.changedVariables.update(variables)
+
+    # constraints (and the variables they introduce) added to the model since it was loaded
+    def add_constraints(self, constraints, variables=()):
+        if(self.model is None):
+            return
+        for var in variables:
+            self.solver.add_var(var)
+        for constraint in constraints:
+            self.solver.add_constraint(constraint)
+
+    def solve(self, model, warmstart=False, tee=True):
+        self.timings = {}
+        t = time.time()
+        if(model is not self.model):
+            self.solver.set_instance(model)
+            self.model = model
+        else:
+            for var in self.changedVariables:
+                self.solver.update_var(var)
+            self.solver.set_objective(model.objective)
+        self.changedVariables = ComponentSet()
+        loadModelTime = (time.time() - t)
+
+        t = time.time()
+        self.results = self.solver.solve(tee=tee, warmstart=warmstart, save_results=False, load_solutions=False)
+        elapsed = (time.time() - t)
+        # set_instance and the updates above, plus what the plugin itself does before solving
+        writeTime = loadModelTime + self.timings.get("write", 0)
+        solvingTime = self.timings.get("solve", elapsed - self.timings.get("write", 0))
+        print("Termination condition: " + str(self.results.solver.termination_condition))
+        # the models maximize: the incumbent is the lower bound
+        print("Best objective: " + str(self.results.problem.lower_bound) + "; best bound: " + str(self.results.problem.upper_bound))
+
+        t = time.time()
+        statusOk = self.results.solver.status == SolverStatus.ok
+        if(statusOk):
+            self.solver.load_vars()
+        loadTime = (time.time() - t)
+        timeLimitHit = self.results.solver.termination_condition in [TerminationCondition.maxTimeLimit]
+        gap = relative_gap(self.results.problem.lower_bound, self.results.problem.upper_bound)
+        optimal = statusOk and self.results.solver.termination_condition == TerminationCondition.optimal
+        return solve_info("persistent", writeTime, solvingTime, loadTime, statusOk, timeLimitHit, gap, optimal)
+
+
+class AppsiBackend:
+    """Pyomo's APPSI interfaces (appsi_highs, appsi_cplex, appsi_gurobi, appsi_cbc): the model is
+    loaded into the solver once and every re-solve of the same model sends only what changed."""
+
+    SOLVERS = {"appsi_highs": appsi.solvers.Highs,
+               "appsi_cplex": appsi.solvers.Cplex,
+               "appsi_gurobi": appsi.solvers.Gurobi,
+               "appsi_cbc": appsi.solvers.Cbc}
+
+    # name of each solver's option dictionary and of its threads option
+    SOLVER_OPTIONS = {"appsi_highs": ("highs_options", "threads"),
+                      "appsi_cplex": ("cplex_options", "threads"),
+                      "appsi_gurobi": ("gurobi_options", "Threads"),
+                      "appsi_cbc": ("cbc_options", "threads")}
+
+    def __init__(self, solver, timeLimit, gap):
+        if(solver not in self.SOLVERS):
+            raise ValueError("Unknown APPSI solver: " + solver)
+        self.name = solver
+        self.solver = self.SOLVERS[solver]()
+        self.solver.config.time_limit = timeLimit
+        self.solver.config.mip_gap = gap
+        # the solution is loaded (and timed) separately
+        self.solver.config.load_solution = False
+        self.results = None
+
+    def set_threads(self, threads):
+        optionsName, threadsOption = self.SOLVER_OPTIONS[self.name]
+        getattr(self.solver, optionsName)[threadsOption] = threads
+
+    def warm_start_capable(self):
+        return hasattr(self.solver, "warm_start_capable") and self.solver.warm_start_capable()
+
+    # changes to mutable parameters, and new variables and constraints, are picked up by the next solve's update
+    def update_constraints(self, constraints):
+        pass
+
+    def add_constraints(self, constraints, variables=()):
+        pass
+
+    def update_variables(self, variables):
+        pass
+
+    def solve(self, model, warmstart=False, tee=True):
+        self.solver.config.stream_solver = tee
+        if(hasattr(self.solver.config, "warmstart")):
+            self.solver.config.warmstart = warmstart
+        timer = HierarchicalTimer()
+        t = time.time()
+        self.results = self.solver.solve(model, timer=timer)
+        elapsed = (time.time() - t)
+        writeTime = sum(timer.get_total_time(step) for step in ["set_instance", "update"] if step in timer.timers)
+        print("Termination condition: " + str(self.results.termination_condition))
+        print("Best objective: " + str(self.results.best_feasible_objective) + "; best bound: " + str(self.results.best_objective_bound))
+
+        t = time.time()
+        statusOk = self.results.best_feasible_objective is not None
+        if(statusOk):
+            self.results.solution_loader.load_vars()
+        loadTime = (time.time() - t)
+        timeLimitHit = self.results.termination_condition == appsi.base.TerminationCondition.maxTimeLimit
+        gap = relative_gap(self.results.best_feasible_objective, self.results.best_objective_bound)
+        optimal = self.results.termination_condition == appsi.base.TerminationCondition.optimal
+        return solve_info("appsi", writeTime, elapsed - writeTime, loadTime, statusOk, timeLimitHit, gap, optimal)
@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from data_maker import Instance
+from planners import Planner
+
+RACE_PREFIX = "race:"
+
+
+def is_race(solver):
+    return solver.startswith(RACE_PREFIX)
+
+
+# "race:cplex,gurobi,cbc" -> ["cplex", "gurobi", "cbc"]
+def race_solvers(solver):
+    return [name for name in solver[len(RACE_PREFIX):].split(",") if name]
+
+
+# runs in a racer process: solve the instance with one solver and send back its runInfo and solution
+def run_racer(plannerClass, timeLimit, gap, solver, threads, data, warmStart, results):
+    # own process group, so that killing the racer also kills the solver executable it started
+    if(hasattr(os, "setpgrp")):
+        os.setpgrp()
+    try:
+        planner = plannerClass(timeLimit=timeLimit, gap=gap, solver=solver)
+        if(threads is not None):
+            planner.set_threads(threads)
+        runInfo = planner.solve_model(data, warmStart)
+        results.put((solver, runInfo, planner.extract_solution_arrays()))
+    except Exception as e:
+        # the exception itself may not pickle
+        results.put((solver, None, repr(e)))
+
+
+def kill_racer(process):
+    if(not process.is_alive()):
+        return
+    try:
+        if(hasattr(os, "killpg")):
+            os.killpg(process.pid, signal.SIGKILL)
+            return
+    except ProcessLookupError:
+        # killed before it got its own process group
+        pass
+    process.kill()
+
+
+# best incumbent, maximizing, among the racers that returned one
+def best_result(results):
+    finished = [result for result in results if result[1]["Status_OK"]]
+    if(len(finished) == 0):
+        finished = results
+    return max(finished, key=lambda result: result[1]["Objective_Function_Value"] or 0)
+
+
+class RacingPlanner:
+    """Solves the same instance with several solvers at once, each planner in its own process.
+    The first racer whose solver proves optimality (within the gap) wins and the others are killed;
+    otherwise the best incumbent found by the time limit wins. graceTime bounds how long racers
+    may take beyond the time limit, to build their model and load their solution, before being killed."""
+
+    def __init__(self, plannerClass, timeLimit, gap, solvers, graceTime=60):
+        if(len(solvers) == 0):
+            raise ValueError("No solvers to race")
+        self.plannerClass = plannerClass
+        self.timeLimit = timeLimit
+        self.gap = gap
+        self.solvers = solvers
+        self.graceTime = graceTime
+        self.threads = None
+        self.arrays = None
+        self.K = None
+        self.T = None
+
+    # the racers share the threads
+    def set_threads(self, threads):
+        self.threads = max(1, threads // len(self.solvers))
+
+    def solve_model(self, data, warmStart=None):
+        self.K, self.T = self.room_days(data)
+        results = multiprocessing.Queue()
+        racers = {solver: multiprocessing.Process(target=run_racer,
+                                                  args=(self.plannerClass, self.timeLimit, self.gap, solver, self.threads, data, warmStart, results))
+                  for solver in self.solvers}
+        t = time.time()
+        for racer in racers.values():
+            racer.start()
+
+        finished = []
+        failures = []
+        winner = None
+        pending = set(racers)
+        deadline = t + self.timeLimit + self.graceTime
+        try:
+            while(len(pending) > 0 and winner is None):
+                # checked before waiting: a racer that had exited has already sent its result
+                alive = any(racers[solver].is_alive() for solver in pending)
+                try:
+                    solver, runInfo, arrays = results.get(timeout=1)
+                except queue.Empty:
+                    # racers stopped without a result, or still running past the deadline
+                    if(not alive or time.time() > deadline):
+                        break
+                    continue
+                pending.discard(solver)
+                if(runInfo is None):
+                    failures.append(solver + ": " + arrays)
+                    continue
+                finished.append((solver, runInfo, arrays))
+                # a feasible stop (e.g. on an APPSI interrupt) is not a proof of optimality
+                if(runInfo.get("Optimal")):
+                    winner = finished[-1]
+        finally:
+            for racer in racers.values():
+                kill_racer(racer)
+                racer.join()
+        elapsed = (time.time() - t)
+
+        if(len(finished) == 0):
+            raise RuntimeError("No racer among " + ", ".join(self.solvers) + " returned a solution" + "".join("; " + failure for failure in failures))
+        if(winner is None):
+            winner = best_result(finished)
+        solver, runInfo, self.arrays = winner
+        runInfo = dict(runInfo)
+        runInfo["Winning_solver"] = solver
+        runInfo["Racing_solvers"] = ",".join(self.solvers)
+        runInfo["Finished_racers"] = len(finished)
+        runInfo["Failed_racers"] = "; ".join(failures)
+        runInfo["Race_time"] = elapsed
+        return runInfo
+
+    # racers start from scratch: there is no model in this process to update
+    def resolve_model(self, data):
+        return self.solve_model(data)
+
+    @staticmethod
+    def room_days(data):
+        if(isinstance(data, Instance)):
+            return data.K, data.T
+        data = data[None]
+        return data['K'][None], data['T'][None]
+
+    def extract_solution(self):
+        return Planner.solution_from_arrays(self.arrays, range(1, self.K + 1), range(1, self.T + 1))
+
+    def extract_solution_arrays(self):
+        return self.arrays
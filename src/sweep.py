@@ -0,0 +1,331 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from data_maker import DataDescriptor, DataMaker, TruncatedNormalParameters, write_data
+from decomposition import DecomposedPlanner, block_solver, is_decomposed
+from instance_cache import InstanceCache
+from planners import GreedyPlanner, SinglePhaseStartingMinutePlanner
+from results_store import ResultsStore
+from solver_race import RACE_PREFIX, RacingPlanner, is_race, race_solvers
+from utils import SolutionSummary, SolutionVisualizer, render_gantt_batch
+
+
+# grid of the original main_SPP.py; a config file overrides any of these keys
+DEFAULT_GRID = {
+    "solvers": ["cplex"],
+    "size": [100, 120],
+    "covid": [0.0, 0.25, 0.5, 0.75, 1.0],
+    "delayWeights": [0.25, 0.5, 0.75],
+    "delayEstimate": ["UO", "procedure"],
+    "timeLimit": 300,
+    "gap": 0.005,
+    "seed": 52876,
+    "dataDescriptor": {
+        "days": 5,
+        "specialtyBalance": 0.17,
+        "operatingDayDuration": 270,
+        "anesthesiaTime": 270,
+        "operatingTimeDistribution": {"low": 30, "high": 120, "mean": 60, "stdDev": 20},
+        "priorityDistribution": {"low": 1, "high": 120, "mean": 60, "stdDev": 10}
+    }
+}
+
+# dumps are written through a large buffer, a patient row at a time
+DUMP_BUFFER_SIZE = 1024 * 1024
+
+
+def load_grid(configFile=None):
+    grid = json.loads(json.dumps(DEFAULT_GRID))
+    if(configFile is None):
+        return grid
+    with open(configFile) as f:
+        config = json.load(f)
+    unknownKeys = set(config) - set(grid)
+    if(unknownKeys):
+        raise ValueError("Unknown grid keys in " + configFile + ": " + ", ".join(sorted(unknownKeys)))
+    grid["dataDescriptor"].update(config.pop("dataDescriptor", {}))
+    grid.update(config)
+    return grid
+
+
+def test_id(delayEstimate, delayWeight, id):
+    return "T_" + str(delayEstimate) + "_di_" + str(delayWeight) + "_" + str(id)
+
+
+# grid cells in the same order, and with the same test ids, as the original nested loops of main_SPP
+def create_cells(solvers, delayEstimates, delayWeights, sizes, covids):
+    cells = []
+    for solver in solvers:
+        for de in delayEstimates:
+            id = 1
+            for dw in delayWeights:
+                for s in sizes:
+                    for c in covids:
+                        cells.append({"testId": test_id(de, dw, id),
+                                      "solver": solver,
+                                      "delayEstimate": de,
+                                      "delayWeight": dw,
+                                      "patients": s,
+                                      "covid": c})
+                        id += 1
+    return cells
+
+
+def create_cells_from_grid(grid):
+    return create_cells(grid["solvers"], grid["delayEstimate"], grid["delayWeights"], grid["size"], grid["covid"])
+
+
+# one cell per grid point, where the grid's solvers race each other (see RacingPlanner); greedy is left
+# out, since it always finishes first
+def create_race_cells_from_grid(grid):
+    return create_cells([race_solver(grid["solvers"])], grid["delayEstimate"], grid["delayWeights"], grid["size"], grid["covid"])
+
+
+def race_solver(solvers):
+    return RACE_PREFIX + ",".join(solver for solver in solvers if solver != "greedy")
+
+
+# deterministic round-robin split: shard i of n (1 <= i <= n) gets every n-th cell starting from the i-th.
+# In parametric mode the split is by delay-weight column instead, so that a column stays on one shard
+def shard_cells(cells, shard, shards, parametric=False):
+    if(not 1 <= shard <= shards):
+        raise ValueError("Shard must be in 1.." + str(shards) + ", got " + str(shard))
+    if(parametric):
+        return [cell for column in delay_weight_columns(cells)[shard - 1::shards] for cell in column]
+    return cells[shard - 1::shards]
+
+
+def parse_shard(value):
+    shard, shards = value.split("/")
+    return int(shard), int(shards)
+
+
+def shard_results_file(shard, shards):
+    return "results_shard_" + str(shard) + "_of_" + str(shards) + ".db"
+
+
+# merge per-shard results stores into one, keeping the first run seen for each (test id, solver)
+def merge_results(inputFiles, outputFile):
+    with ResultsStore(outputFile) as store:
+        return store.merge(inputFiles)
+
+
+# one HTML Gantt chart per stored schedule, named after its test id and solver
+def render_schedules(resultsFile, outputDirectory, workers=None):
+    with ResultsStore(resultsFile) as store:
+        schedules = store.query("SELECT * FROM schedules")
+        roomDays = store.query("SELECT * FROM room_days")
+        runs = store.query("SELECT test_id, solver FROM runs ORDER BY test_id, solver")
+    schedules = dict(list(schedules.groupby(["test_id", "solver"])))
+    roomDays = dict(list(roomDays.groupby(["test_id", "solver"])))
+
+    jobs = []
+    for key in runs.itertuples(index=False, name=None):
+        schedule = schedules.get(key, pd.DataFrame(columns=["room", "day", "start", "operating_time", "covid", "precedence"]))
+        roomTimes = None
+        if(key in roomDays):
+            # s[k, t] is what the room-day used plus what it left idle
+            rooms = roomDays[key].pivot(index="room", columns="day", values="used_minutes") + roomDays[key].pivot(index="room", columns="day", values="idle_minutes")
+            roomTimes = rooms.to_numpy()
+            K, T = roomTimes.shape
+        elif(len(schedule) > 0):
+            K, T = int(schedule["room"].max()), int(schedule["day"].max())
+        else:
+            # neither rooms nor patients to draw
+            print("Skipping " + key[0] + " (" + key[1] + "): empty schedule")
+            continue
+        columns = {name: schedule[name].tolist() for name in ["room", "day", "start", "operating_time", "covid", "precedence"]}
+        jobs.append((key[0] + "_" + key[1] + ".html", columns, K, T, roomTimes))
+    return render_gantt_batch(jobs, outputDirectory, workers)
+
+
+def create_data_descriptor(cell, descriptorFields):
+    dataDescriptor = DataDescriptor()
+
+    dataDescriptor.patients = cell["patients"]
+    dataDescriptor.days = descriptorFields["days"]
+    dataDescriptor.anesthetists = "N/A"
+    dataDescriptor.covidFrequence = cell["covid"]
+    dataDescriptor.anesthesiaFrequence = "N/A"
+    dataDescriptor.specialtyBalance = descriptorFields["specialtyBalance"]
+    dataDescriptor.operatingDayDuration = descriptorFields["operatingDayDuration"]
+    dataDescriptor.anesthesiaTime = descriptorFields["anesthesiaTime"]
+    dataDescriptor.delayWeight = cell["delayWeight"]
+    dataDescriptor.operatingTimeDistribution = TruncatedNormalParameters(**descriptorFields["operatingTimeDistribution"])
+    dataDescriptor.priorityDistribution = TruncatedNormalParameters(**descriptorFields["priorityDistribution"])
+    if("specialties" in cell):
+        dataDescriptor.specialties = cell["specialties"]
+    if("operatingRooms" in cell):
+        dataDescriptor.operatingRooms = cell["operatingRooms"]
+    return dataDescriptor
+
+
+# streams the cell's waiting list and solution to dumpDirectory, like the per-test logs of the original main_SPP
+def dump_cell(cell, instance, solution, dumpDirectory, dumpFormat):
+    name = os.path.join(dumpDirectory, cell["testId"] + "_" + cell["solver"])
+    sv = SolutionVisualizer()
+    if(dumpFormat == "tsv"):
+        with open(name + "_waiting_list.tsv", "w", buffering=DUMP_BUFFER_SIZE) as f:
+            write_data(instance, f, format="tsv")
+        with open(name + "_schedule.tsv", "w", buffering=DUMP_BUFFER_SIZE) as f:
+            sv.write_solution(solution, f, format="tsv")
+        return
+    with open(name + ".log", "w", buffering=DUMP_BUFFER_SIZE) as f:
+        f.write("Overall patients:\n")
+        write_data(instance, f)
+        f.write("\n")
+        sv.write_solution(solution, f)
+
+
+def create_planner(cell, plannerClass, timeLimit, gap, threads):
+    # "greedy" in the solvers list runs the constructive heuristic as a baseline
+    if(cell["solver"] == "greedy"):
+        plannerClass = GreedyPlanner
+    if(is_race(cell["solver"])):
+        planner = RacingPlanner(plannerClass, timeLimit, gap, race_solvers(cell["solver"]))
+    elif(is_decomposed(cell["solver"])):
+        # e.g. "decomposed:cplex" solves each specialty-room block with cplex (see DecomposedPlanner)
+        solver = block_solver(cell["solver"])
+        planner = DecomposedPlanner(GreedyPlanner if solver == "greedy" else plannerClass, timeLimit, gap, solver)
+    else:
+        planner = plannerClass(timeLimit=timeLimit, gap=gap, solver=cell["solver"])
+    if(threads is not None):
+        planner.set_threads(threads)
+    return planner
+
+
+# what the results store records about a solved cell. The waiting list and the schedule are not part of it:
+# they go row by row from the worker to the store at resultsFile, if any
+def cell_record(cell, planner, instance, runInfo, elapsed, dumpDirectory, dumpFormat, resultsFile=None):
+    solution = planner.extract_solution()
+    summary = SolutionSummary(solution, instance.K, instance.T, instance.operatingRoomTimes)
+    if(dumpDirectory is not None):
+        dump_cell(cell, instance, solution, dumpDirectory, dumpFormat)
+    if(resultsFile is not None):
+        with ResultsStore(resultsFile) as store:
+            store.write_patient_rows(cell, ResultsStore.waiting_list_rows(instance), ResultsStore.schedule_rows(solution))
+
+    return {"cell": cell,
+            "runInfo": runInfo,
+            "overallTime": round(elapsed, 2),
+            "solutionValue": summary.value,
+            "selectedPatients": summary.operatedPatients,
+            "partitioning": summary.partitioning_by_precedence(),
+            "roomDays": summary.room_day_rows(),
+            "specialties": summary.specialty_rows()}
+
+
+# runs in a worker process: solve one grid cell and return what the results store records about it
+def run_cell(cell, plannerClass, timeLimit, gap, threads, descriptorFields, seed, cacheDirectory=None, dumpDirectory=None, dumpFormat="text", resultsFile=None):
+    planner = create_planner(cell, plannerClass, timeLimit, gap, threads)
+
+    dataDescriptor = create_data_descriptor(cell, descriptorFields)
+    if("instanceFile" in cell):
+        instance = DataMaker(seed=seed).create_instance_from_arrays(load_instance_file(cell["instanceFile"]), cell["delayWeight"])
+    elif(cacheDirectory is not None):
+        # cells differing only in delayWeight share one cached instance
+        instance = InstanceCache(cacheDirectory).get_instance(dataDescriptor, seed, cell["delayEstimate"])
+    else:
+        instance = DataMaker(seed=seed).create_instance(dataDescriptor, cell["delayEstimate"])
+
+    t = time.time()
+    runInfo = planner.solve_model(instance)
+    elapsed = (time.time() - t)
+    return cell_record(cell, planner, instance, runInfo, elapsed, dumpDirectory, dumpFormat, resultsFile)
+
+
+# arrays of an instance of an instance library (see instance_library.py), without the delay weight
+def load_instance_file(path):
+    with np.load(path) as arrays:
+        return dict(arrays)
+
+
+# cells differing only in delayWeight, in the order of the delayWeights list
+def delay_weight_columns(cells):
+    columns = {}
+    for cell in cells:
+        columns.setdefault((cell["solver"], cell["delayEstimate"], cell["patients"], cell["covid"], cell.get("instanceFile")), []).append(cell)
+    return list(columns.values())
+
+
+# runs in a worker process: solve a delay-weight column with one planner. The instance is drawn once,
+# the first cell is solved cold and every next one updates d in place and re-solves from the previous solution
+def run_column(cells, plannerClass, timeLimit, gap, threads, descriptorFields, seed, cacheDirectory=None, dumpDirectory=None, dumpFormat="text", resultsFile=None):
+    planner = create_planner(cells[0], plannerClass, timeLimit, gap, threads)
+
+    dataDescriptor = create_data_descriptor(cells[0], descriptorFields)
+    dataMaker = DataMaker(seed=seed)
+    if("instanceFile" in cells[0]):
+        arrays = load_instance_file(cells[0]["instanceFile"])
+    elif(cacheDirectory is not None):
+        arrays = InstanceCache(cacheDirectory).get_arrays(dataDescriptor, seed, cells[0]["delayEstimate"])
+    else:
+        arrays = dataMaker.draw_instance_arrays(dataDescriptor, cells[0]["delayEstimate"])
+
+    records = []
+    for cell in cells:
+        instance = dataMaker.create_instance_from_arrays(arrays, cell["delayWeight"])
+        t = time.time()
+        runInfo = planner.resolve_model(instance)
+        elapsed = (time.time() - t)
+        records.append(cell_record(cell, planner, instance, runInfo, elapsed, dumpDirectory, dumpFormat, resultsFile))
+    return records
+
+
+class SweepRunner:
+    """Runs grid cells in a process pool, recording every finished cell in the results store at resultsFile.
+    Cells already in the store are skipped, so an interrupted sweep can be resumed. In parametric mode, a worker
+    runs the cells differing only in delayWeight one after another, re-solving one model (see run_column)."""
+
+    def __init__(self, resultsFile="results.db", workers=None, plannerClass=SinglePhaseStartingMinutePlanner, timeLimit=300, gap=0.005,
+                 descriptorFields=None, seed=52876, cacheDirectory=None, dumpDirectory=None, dumpFormat="text", parametric=False):
+        self.resultsFile = resultsFile
+        self.workers = workers or os.cpu_count()
+        # share the cores of the box among the workers
+        self.threads = max(1, os.cpu_count() // self.workers)
+        self.plannerClass = plannerClass
+        self.timeLimit = timeLimit
+        self.gap = gap
+        self.descriptorFields = descriptorFields or DEFAULT_GRID["dataDescriptor"]
+        self.seed = seed
+        self.cacheDirectory = cacheDirectory
+        self.dumpDirectory = dumpDirectory
+        self.dumpFormat = dumpFormat
+        self.parametric = parametric
+        if(dumpDirectory is not None):
+            os.makedirs(dumpDirectory, exist_ok=True)
+
+    def run(self, cells):
+        with ResultsStore(self.resultsFile) as store:
+            completed = store.completed_cells()
+            pending = [cell for cell in cells if (cell["testId"], cell["solver"]) not in completed]
+            print(str(len(cells) - len(pending)) + " cells already done, " + str(len(pending)) + " to run on "
+                  + str(self.workers) + " workers with " + str(self.threads) + " solver threads each.")
+            if(len(pending) == 0):
+                return
+
+            arguments = (self.plannerClass, self.timeLimit, self.gap, self.threads, self.descriptorFields, self.seed,
+                         self.cacheDirectory, self.dumpDirectory, self.dumpFormat, self.resultsFile)
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                if(self.parametric):
+                    futures = {executor.submit(run_column, column, *arguments): column for column in delay_weight_columns(pending)}
+                else:
+                    futures = {executor.submit(run_cell, cell, *arguments): [cell] for cell in pending}
+                for future in as_completed(futures):
+                    try:
+                        records = future.result()
+                    except Exception as e:
+                        # not recorded: the cells are retried on the next run
+                        for cell in futures[future]:
+                            print("Cell " + cell["testId"] + " (" + cell["solver"] + ") failed: " + repr(e))
+                        continue
+                    if(not self.parametric):
+                        records = [records]
+                    for record in records:
+                        store.add_run(**record)
+                        print("Cell " + record["cell"]["testId"] + " (" + record["cell"]["solver"] + ") done.")
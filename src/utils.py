@@ -1,83 +1,85 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 from numpy import sort
+import numpy as np
 import plotly.express as px
 import pandas as pd
-import datetime
 
 from pyparsing import PrecededBy
 
+SOLUTION_COLUMNS = ["day", "room", "patient_id", "start", "operating_time", "priority", "specialty", "covid", "precedence"]
+
+PRECEDENCE_DESCRIPTIONS = ["Clean procedure, on schedule", "Clean procedure, delay expected",
+                           "Dirty procedure, on schedule", "Dirty procedure, delay expected",
+                           "Covid-19 patient, on schedule", "Covid-19 patient, delay expected"]
+
+
+class SolutionSummary:
+    """Figures of a solution computed in one pass: value (sum of the operated patients' priorities),
+    operated patients, counts by precedence class, used and idle minutes of each room-day and
+    totals by specialty. K and T size the room-day arrays, roomTimes is the K x T array of s[k, t];
+    without it every room-day is taken to last operatingDayDuration minutes."""
+
+    def __init__(self, solution, K, T, roomTimes=None, operatingDayDuration=270):
+        self.K = K
+        self.T = T
+        roomDays = [(k, t) for (k, t), patients in solution.items() for patient in patients]
+        patients = [patient for patients in solution.values() for patient in patients]
+        rooms = np.array([k for (k, t) in roomDays], dtype=int)
+        days = np.array([t for (k, t) in roomDays], dtype=int)
+        operatingTimes = np.array([patient.operatingTime for patient in patients], dtype=float)
+        priorities = np.array([patient.priority for patient in patients])
+        specialties = np.array([patient.specialty for patient in patients], dtype=int)
+        precedences = np.array([patient.precedence for patient in patients], dtype=int)
+
+        self.value = priorities.sum().item() if len(patients) > 0 else 0
+        self.operatedPatients = len(patients)
+        self.precedenceCounts = np.bincount(precedences - 1, minlength=6)[:6] if len(patients) > 0 else np.zeros(6, dtype=int)
+        self.roomTimes = np.full((K, T), operatingDayDuration, dtype=float) if roomTimes is None else np.asarray(roomTimes, dtype=float)
+        self.usedMinutes = np.zeros((K, T))
+        np.add.at(self.usedMinutes, (rooms - 1, days - 1), operatingTimes)
+        self.idleMinutes = self.roomTimes - self.usedMinutes
+        self.utilisation = self.usedMinutes / self.roomTimes
+        self.specialtyPatients = {j: int((specialties == j).sum()) for j in np.unique(specialties).tolist()}
+        self.specialtyMinutes = {j: operatingTimes[specialties == j].sum().item() for j in self.specialtyPatients}
+        self.specialtyValue = {j: priorities[specialties == j].sum().item() for j in self.specialtyPatients}
+
+    def partitioning_by_precedence(self):
+        return self.precedenceCounts.tolist()
+
+    # (room, day, used minutes, idle minutes, utilisation)
+    def room_day_rows(self):
+        return [(k + 1, t + 1, self.usedMinutes[k, t].item(), self.idleMinutes[k, t].item(), self.utilisation[k, t].item())
+                for k in range(self.K) for t in range(self.T)]
+
+    # (specialty, patients, minutes, value)
+    def specialty_rows(self):
+        return [(j, self.specialtyPatients[j], self.specialtyMinutes[j], self.specialtyValue[j]) for j in self.specialtyPatients]
+
+
 class SolutionVisualizer:
 
     def __init__(self):
         pass
 
-    def compute_solution_value(self, solution):
-        KT = max(solution.keys())
-        K = KT[0]
-        T = KT[1]
+    # the summary is not kept: callers showing several figures of one solution hold it themselves
+    def solution_summary(self, solution):
+        K, T = max(solution.keys())
+        return SolutionSummary(solution, K, T)
 
-        value = 0
-        for t in range(1, T + 1):
-            for k in range(1, K + 1):
-                for patient in solution[(k, t)]:
-                    value = value + patient.priority
-        return value
+    def compute_solution_value(self, solution):
+        return self.solution_summary(solution).value
 
     def print_patients_by_precedence(self, solution):
-        KT = max(solution.keys())
-        K = KT[0]
-        T = KT[1]
+        self.print_partitioning(self.solution_summary(solution).partitioning_by_precedence())
 
-        PO = 0
-        PR = 0
-        SO = 0
-        SR = 0
-        CO = 0
-        CR = 0
-        for t in range(1, T + 1):
-            for k in range(1, K + 1):
-                for patient in solution[(k, t)]:
-                    if(patient.precedence == 1):
-                        PO += 1
-                    elif(patient.precedence == 2):
-                        PR += 1
-                    elif(patient.precedence == 3):
-                        SO += 1
-                    elif(patient.precedence == 4):
-                        SR += 1
-                    elif(patient.precedence == 5):
-                        CO += 1
-                    elif(patient.precedence == 6):
-                        CR += 1
-        print("PO: " + str(PO) + "\n" + "PR " + str(PR) + "\n" + "SO: " + str(SO) + "\n" + "SR: " + str(SR) + "\n" + "CO: " + str(CO) + "\n" + "CR: " + str(CR) + "\n")
+    def print_partitioning(self, counts):
+        print("PO: " + str(counts[0]) + "\n" + "PR " + str(counts[1]) + "\n" + "SO: " + str(counts[2]) + "\n" + "SR: " + str(counts[3]) + "\n" + "CO: " + str(counts[4]) + "\n" + "CR: " + str(counts[5]) + "\n")
 
     def compute_solution_partitioning_by_precedence(self, solution):
-        KT = max(solution.keys())
-        K = KT[0]
-        T = KT[1]
-
-        PO = 0
-        PR = 0
-        SO = 0
-        SR = 0
-        CO = 0
-        CR = 0
-        for t in range(1, T + 1):
-            for k in range(1, K + 1):
-                for patient in solution[(k, t)]:
-                    if(patient.precedence == 1):
-                        PO += 1
-                    elif(patient.precedence == 2):
-                        PR += 1
-                    elif(patient.precedence == 3):
-                        SO += 1
-                    elif(patient.precedence == 4):
-                        SR += 1
-                    elif(patient.precedence == 5):
-                        CO += 1
-                    elif(patient.precedence == 6):
-                        CR += 1
-
-        return [PO, PR, SO, SR, CO, CR]
+        return self.solution_summary(solution).partitioning_by_precedence()
 
 
     def print_solution(self, solution):
@@ -104,115 +106,95 @@ class SolutionVisualizer:
         print("Total number of operated patients: " + str(operatedPatients))
 
     def solution_as_string(self, solution):
-        KT = max(solution.keys())
-        K = KT[0]
-        T = KT[1]
-
-        result = "Operated patients, for each day and for each room:\n"
+        buffer = io.StringIO()
+        self.write_solution(solution, buffer)
+        return buffer.getvalue()
+
+    # streams the solution to an open file, one line per patient: "text" is the layout of
+    # solution_as_string, "tsv" one tab-separated row per operated patient under a header
+    def write_solution(self, solution, file, format="text"):
+        K, T = max(solution.keys())
+        if(format == "tsv"):
+            file.write("\t".join(SOLUTION_COLUMNS) + "\n")
+            for t in range(1, T + 1):
+                for k in range(1, K + 1):
+                    for patient in solution[(k, t)]:
+                        file.write(f"{t}\t{k}\t{patient.id}\t{patient.order}\t{patient.operatingTime}\t{patient.priority}\t{patient.specialty}\t{patient.covid}\t{patient.precedence}\n")
+            return
+        if(format != "text"):
+            raise ValueError("Unknown format: " + str(format))
+        file.write("Operated patients, for each day and for each room:\n")
         for t in range(1, T + 1):
             for k in range(1, K + 1):
-                result += "Day: " + str(t) + "; Operating Room: S" + str(k) + "\n"
+                file.write("Day: " + str(t) + "; Operating Room: S" + str(k) + "\n")
                 if(len(solution[(k, t)]) == 0):
-                    result += "---" + "\n"
+                    file.write("---" + "\n")
                 for patient in solution[(k, t)]:
-                    result += str(patient) + "\n"
-                result += "\n"
-        return result
+                    file.write(str(patient) + "\n")
+                file.write("\n")
 
     def count_operated_patients(self, solution):
-        KT = max(solution.keys())
-        K = KT[0]
-        T = KT[1]
-
-        operatedPatients = 0
-        for t in range(1, T + 1):
-            for k in range(1, K + 1):
-                operatedPatients += len(solution[(k, t)])
-        return operatedPatients
+        return self.solution_summary(solution).operatedPatients
 
 
     def plot_graph(self, solution):
         if(solution is None):
             print("No solution exists to be plotted!")
             return
-
-        KT = max(solution.keys())
-        K = KT[0]
-        T = KT[1]
-
-        dataFrames = []
-        dff = pd.DataFrame([])
-        for t in range(1, T + 1):
-            df = pd.DataFrame([])
-            for k in range(1, K + 1):
-                patients = solution[(k, t)]
-                for idx in range(0, len(patients)):
-                    patient = patients[idx]
-                    start = datetime.datetime(1970, 1, t, 8, 0, 0) + datetime.timedelta(minutes=round(patient.order))
-                    finish = start + datetime.timedelta(minutes=round(patient.operatingTime))
-                    room = "S" + str(k)
-                    covid = "Y" if patient.covid == 1 else "N"
-                    precedence = patient.precedence
-                    if(precedence == 1):
-                        precedence = "Clean procedure, on schedule"
-                    elif(precedence == 2):
-                        precedence = "Clean procedure, delay expected"
-                    elif(precedence == 3):
-                        precedence = "Dirty procedure, on schedule"
-                    elif(precedence == 4):
-                        precedence = "Dirty procedure, delay expected"
-                    elif(precedence == 5):
-                        precedence = "Covid-19 patient, on schedule"
-                    elif(precedence == 6):
-                        precedence = "Covid-19 patient, delay expected"
-                    dataFrameToAdd = pd.DataFrame([dict(Start=start, Finish=finish, Room=room, Covid=covid, Precedence=precedence)])
-                    df = pd.concat([df, dataFrameToAdd])
-            dataFrames.append(df)
-            dff = pd.concat([df, dff])
-
-        # sort legend's labels
-        sortingOrder = ["Clean procedure, on schedule", "Clean procedure, delay expected",
-                        "Dirty procedure, on schedule", "Dirty procedure, delay expected",
-                        "Covid-19 patient, on schedule", "Covid-19 patient, delay expected"]
-        order  = []
-        for precedenceValue in dff["Precedence"].tolist():
-            if(not precedenceValue in order):
-                order.append(precedenceValue)
-        order.sort(key=sortingOrder.index)
-        dff = dff.set_index('Precedence')
-        dff= dff.T[order].T.reset_index()
+        self.create_gantt_figure(self.create_timeline_frame(self.solution_columns(solution)), *max(solution.keys())).show()
+
+    # columns of a solution's schedule, the same as the schedules table of the results store
+    @staticmethod
+    def solution_columns(solution):
+        patients = [(k, t, patient) for (k, t), patients in solution.items() for patient in patients]
+        return {"room": [k for (k, t, patient) in patients],
+                "day": [t for (k, t, patient) in patients],
+                "start": [patient.order for (k, t, patient) in patients],
+                "operating_time": [patient.operatingTime for (k, t, patient) in patients],
+                "covid": [patient.covid for (k, t, patient) in patients],
+                "precedence": [patient.precedence for (k, t, patient) in patients]}
+
+    # the whole timeline frame at once; day t starts at 8:00 of 1970-01-t
+    @staticmethod
+    def create_timeline_frame(columns):
+        columns = pd.DataFrame(columns)
+        start = (pd.Timestamp(1970, 1, 1, 8) + pd.to_timedelta(columns["day"] - 1, unit="D")
+                 + pd.to_timedelta(columns["start"].round(), unit="m"))
+        return pd.DataFrame({"Start": start,
+                             "Finish": start + pd.to_timedelta(columns["operating_time"].round(), unit="m"),
+                             "Room": "S" + columns["room"].astype(str),
+                             "Covid": np.where(columns["covid"] == 1, "Y", "N"),
+                             "Precedence": [PRECEDENCE_DESCRIPTIONS[precedence - 1] for precedence in columns["precedence"]]})
+
+    # roomTimes is the K x T array of s[k, t]: each day ends when its longest room closes
+    # (operatingDayDuration minutes after 8:00 without it), and the night is cut from the axis
+    @staticmethod
+    def create_gantt_figure(frame, K, T, roomTimes=None, operatingDayDuration=270):
+        roomTimes = np.full((K, T), operatingDayDuration) if roomTimes is None else np.asarray(roomTimes)
+        dayStarts = [pd.Timestamp(1970, 1, t, 8) for t in range(1, T + 1)]
+        dayEnds = [dayStarts[t] + pd.Timedelta(minutes=float(roomTimes[:, t].max())) for t in range(T)]
 
         color_discrete_map = {'Clean procedure, on schedule': '#38A6A5', 'Clean procedure, delay expected': '#0F8554',
                                 'Dirty procedure, on schedule': '#73AF48', 'Dirty procedure, delay expected': '#EDAD08',
                                 'Covid-19 patient, on schedule': '#E17C05', 'Covid-19 patient, delay expected': '#CC503E'}
 
-        fig = px.timeline(dff,
+        fig = px.timeline(frame,
                           x_start="Start",
                           x_end="Finish",
                           y="Room",
                           color="Precedence",
-                          # text="Anesthetist",
                           labels={"Start": "Procedure start", "Finish": "Procedure end", "Room": "Operating room",
                                   "Covid": "Covid patient", "Precedence": "Procedure Type and Delay"},
                           hover_data=["Precedence", "Covid"],
-                          color_discrete_map=color_discrete_map
+                          color_discrete_map=color_discrete_map,
+                          # sort legend's labels
+                          category_orders={"Precedence": PRECEDENCE_DESCRIPTIONS}
                           )
 
-        fig.update_xaxes(
-        rangebreaks=[
-        dict(bounds=['1970-01-01 12:30:00','1970-01-02 08:00:00']),
-        dict(bounds=['1970-01-02 12:30:00','1970-01-03 08:00:00']),
-        dict(bounds=['1970-01-03 12:30:00','1970-01-04 08:00:00']),
-        dict(bounds=['1970-01-04 12:30:00','1970-01-05 08:00:00'])
-        ]
-        )
-
-        fig.add_vline(x='1970-01-01 08:00:00', line_width=1, line_dash="solid", line_color="black")
-        fig.add_vline(x='1970-01-02 08:00:00', line_width=1, line_dash="solid", line_color="black")
-        fig.add_vline(x='1970-01-03 08:00:00', line_width=1, line_dash="solid", line_color="black")
-        fig.add_vline(x='1970-01-04 08:00:00', line_width=1, line_dash="solid", line_color="black")
-        fig.add_vline(x='1970-01-05 08:00:00', line_width=1, line_dash="solid", line_color="black")
-        fig.add_vline(x='1970-01-05 12:30:00', line_width=1, line_dash="solid", line_color="black")
+        fig.update_xaxes(rangebreaks=[dict(bounds=[str(dayEnds[t]), str(dayStarts[t + 1])]) for t in range(T - 1)])
+        for dayStart in dayStarts:
+            fig.add_vline(x=str(dayStart), line_width=1, line_dash="solid", line_color="black")
+        fig.add_vline(x=str(dayEnds[-1]), line_width=1, line_dash="solid", line_color="black")
 
         fig.update_layout(xaxis=dict(title='Timetable', tickformat='%H:%M:%S',), legend={"traceorder": "normal"})
         fig.update_layout(legend=dict(
@@ -223,4 +205,21 @@ class SolutionVisualizer:
         x=1
         ))
         fig.update_yaxes(categoryorder='category descending')
-        fig.show()
\ No newline at end of file
+        return fig
+
+
+# runs in a worker process: no display is involved, the figure goes straight to an HTML file.
+# All files of a batch share the plotly.js written once in their directory
+def write_gantt_html(path, columns, K, T, roomTimes=None):
+    fig = SolutionVisualizer.create_gantt_figure(SolutionVisualizer.create_timeline_frame(columns), K, T, roomTimes)
+    fig.write_html(path, include_plotlyjs="directory")
+    return path
+
+
+# jobs are (file name, schedule columns, K, T, roomTimes) tuples; returns the paths written
+def render_gantt_batch(jobs, outputDirectory, workers=None):
+    os.makedirs(outputDirectory, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(write_gantt_html, os.path.join(outputDirectory, name), columns, K, T, roomTimes)
+                   for (name, columns, K, T, roomTimes) in jobs]
+        return [future.result() for future in futures]
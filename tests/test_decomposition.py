@@ -0,0 +1,40 @@
+import pyomo.environ as pyo
+import pytest
+
+from data_maker import DataMaker
+from decomposition import DecomposedPlanner, decomposed_solver
+from planners import SinglePhaseStartingMinutePlanner
+from sweep import DEFAULT_GRID, create_data_descriptor, run_cell
+
+pytestmark = pytest.mark.skipif(not pyo.SolverFactory("appsi_highs").available(exception_flag=False), reason="HiGHS is not installed")
+
+
+# each specialty has rooms of its own: one block per specialty
+@pytest.mark.parametrize("specialties, operatingRooms", [(2, 4), (3, 6)])
+def test_decomposed_objective_matches_single_phase(specialties, operatingRooms):
+    cell = {"patients": 24, "covid": 0.5, "delayWeight": 0.5, "specialties": specialties, "operatingRooms": operatingRooms}
+    instance = DataMaker(seed=3).create_instance(create_data_descriptor(cell, DEFAULT_GRID["dataDescriptor"]), "UO")
+    singlePlanner = SinglePhaseStartingMinutePlanner(timeLimit=60, gap=0, solver="appsi_highs")
+    singleRunInfo = singlePlanner.solve_model(instance)
+    decomposedPlanner = DecomposedPlanner(SinglePhaseStartingMinutePlanner, timeLimit=60, gap=0, solver="appsi_highs", maxWorkers=2)
+    decomposedRunInfo = decomposedPlanner.solve_model(instance)
+
+    assert decomposedRunInfo["Blocks"] == specialties
+    assert singleRunInfo["Optimal"] and decomposedRunInfo["Optimal"]
+    assert decomposedRunInfo["Objective_Function_Value"] == pytest.approx(singleRunInfo["Objective_Function_Value"])
+
+    # warm-started from the monolithic solution, each block starts from its part of it
+    warmStart = singlePlanner.extract_solution()
+    warmStartIds = {key: [patient.id for patient in patients] for key, patients in warmStart.items()}
+    warmRunInfo = decomposedPlanner.solve_model(instance, warmStart)
+    assert warmRunInfo["Warm_start_provided"]
+    assert warmRunInfo["Objective_Function_Value"] == pytest.approx(singleRunInfo["Objective_Function_Value"])
+    # the caller's solution is left as it was
+    assert {key: [patient.id for patient in patients] for key, patients in warmStart.items()} == warmStartIds
+
+
+def test_sweep_runs_decomposed_cells():
+    cell = {"testId": "T_UO_di_0.5_1", "solver": decomposed_solver("appsi_highs"), "delayEstimate": "UO", "delayWeight": 0.5, "patients": 20, "covid": 0.5}
+    record = run_cell(cell, SinglePhaseStartingMinutePlanner, 60, 0, 2, DEFAULT_GRID["dataDescriptor"], 52876)
+    assert record["runInfo"]["Blocks"] == 2
+    assert record["solutionValue"] > 0
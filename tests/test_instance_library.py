@@ -0,0 +1,83 @@
+import itertools
+
+import numpy as np
+import pyomo.environ as pyo
+import pytest
+
+from data_maker import DataMaker
+from instance_library import InstanceLibrary, create_cells_from_library, generate_library, load_library_config
+from planners import SinglePhaseStartingMinutePlanner
+from results_store import ResultsStore
+from sweep import DEFAULT_GRID, create_data_descriptor, run_cell
+
+
+def multi_axis_config():
+    config = load_library_config()
+    config["combinations"] = [{"patients": s, "covid": 0.5, "delayEstimate": de, "specialties": j, "operatingRooms": k}
+                              for s, de, j, k in itertools.product([10, 20], ["UO", "procedure"], [2, 3], [4, 6])]
+    config["replications"] = 2
+    return config
+
+
+def test_generate_and_reload_multi_axis_grid(tmp_path):
+    config = multi_axis_config()
+    manifest = generate_library(config, str(tmp_path), workers=2)
+    library = InstanceLibrary(str(tmp_path))
+
+    assert len(library.instances()) == len(config["combinations"]) * 2
+    assert len(library.instances(specialties=3, operatingRooms=6, replication=2)) == 4
+    for entry in library.instances():
+        combination = entry["combination"]
+        instance = library.load_instance(entry, delayWeight=0.5)
+        assert len(instance.operatingTimes) == combination["patients"]
+        assert instance.J == combination["specialties"]
+        assert instance.K == combination["operatingRooms"]
+        assert instance.T == config["dataDescriptor"]["days"]
+        assert set(instance.specialties.tolist()) <= set(range(1, combination["specialties"] + 1))
+        # every room belongs to exactly one specialty
+        assert (instance.tau.sum(axis=0) == 1).all()
+
+    # the same seed yields the same library
+    generate_library(config, str(tmp_path / "again"), workers=2)
+    again = InstanceLibrary(str(tmp_path / "again"))
+    assert manifest["instances"] == again.manifest["instances"]
+    for entry in library.instances():
+        arrays, otherArrays = library.load_arrays(entry), again.load_arrays(entry)
+        assert all(np.array_equal(arrays[name], otherArrays[name]) for name in arrays)
+
+
+def test_sweep_cells_load_library_instances(tmp_path):
+    config = load_library_config()
+    config["combinations"] = [{"patients": 10, "covid": 0.5, "delayEstimate": "UO", "operatingRooms": 2}]
+    generate_library(config, str(tmp_path))
+    library = InstanceLibrary(str(tmp_path))
+
+    cells = create_cells_from_library(library, ["greedy"], [0.25, 0.75])
+    assert [cell["testId"] for cell in cells] == ["T_UO_di_0.25_1", "T_UO_di_0.75_1"]
+    resultsFile = str(tmp_path / "results.db")
+    for cell in cells:
+        record = run_cell(cell, SinglePhaseStartingMinutePlanner, 10, 0.005, 1, DEFAULT_GRID["dataDescriptor"], config["seed"], resultsFile=resultsFile)
+        instance = library.load_instance(library.instances()[0], cell["delayWeight"])
+        with ResultsStore(resultsFile) as store:
+            waitingList = store.query("SELECT priority FROM waiting_lists WHERE test_id = ? ORDER BY patient_id", (cell["testId"],))
+            schedule = store.schedule(cell["testId"], cell["solver"])
+        # the worker wrote the patient rows itself
+        assert waitingList["priority"].tolist() == instance.priorities.tolist()
+        assert len(schedule) == record["selectedPatients"]
+        # the library's 2 rooms, not the default 4
+        assert {row[0] for row in record["roomDays"]} == {1, 2}
+
+
+@pytest.mark.skipif(not pyo.SolverFactory("appsi_highs").available(exception_flag=False), reason="HiGHS is not installed")
+@pytest.mark.parametrize("concrete", [False, True])
+def test_specialty_without_patients_builds_and_solves(concrete):
+    cell = {"patients": 12, "covid": 0.5, "delayWeight": 0.5, "specialties": 3, "operatingRooms": 6}
+    instance = DataMaker(seed=1).create_instance(create_data_descriptor(cell, DEFAULT_GRID["dataDescriptor"]), "UO")
+    # with J > 2 a specialty can draw no patient; here the third one
+    instance.specialties[instance.specialties == 3] = 1
+
+    planner = SinglePhaseStartingMinutePlanner(timeLimit=60, gap=0, solver="appsi_highs", concrete=concrete)
+    runInfo = planner.solve_model(instance)
+    assert runInfo["Optimal"]
+    for (k, t), patients in planner.extract_solution().items():
+        assert all(instance.tau[patient.specialty - 1, k - 1, t - 1] == 1 for patient in patients)
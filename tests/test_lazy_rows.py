@@ -0,0 +1,39 @@
+import pyomo.environ as pyo
+import pytest
+
+from data_maker import DataMaker
+from planners import SinglePhaseStartingMinutePlanner
+from sweep import DEFAULT_GRID, create_data_descriptor
+
+pytestmark = pytest.mark.skipif(not pyo.SolverFactory("appsi_highs").available(exception_flag=False), reason="HiGHS is not installed")
+
+
+# a shorter first room-day: the relaxation without sequencing rows packs it with start times past its end,
+# so the lazy loop cannot settle for the incumbent stacked by precedence and must add big-M rows
+def short_room_day_instance(patients, seed):
+    dataDescriptor = create_data_descriptor({"patients": patients, "covid": 0.5, "delayWeight": 0.5}, DEFAULT_GRID["dataDescriptor"])
+    instance = DataMaker(seed=seed).create_instance(dataDescriptor, "UO")
+    instance.operatingRoomTimes[0, 0] = 200
+    return instance
+
+
+@pytest.mark.parametrize("patients, seed", [(12, 1), (16, 2)])
+def test_lazy_rows_are_added_and_resolved(patients, seed):
+    instance = short_room_day_instance(patients, seed)
+    lazyPlanner = SinglePhaseStartingMinutePlanner(timeLimit=60, gap=0, solver="appsi_highs", lazy=True)
+    lazyRunInfo = lazyPlanner.solve_model(instance)
+    fullRunInfo = SinglePhaseStartingMinutePlanner(timeLimit=60, gap=0, solver="appsi_highs").solve_model(instance)
+
+    assert lazyRunInfo["Lazy_iterations"] > 1
+    assert lazyRunInfo["Lazy_rows"] > 0
+    assert lazyRunInfo["Optimal"] and fullRunInfo["Optimal"]
+    assert lazyRunInfo["Objective_Function_Value"] == pytest.approx(fullRunInfo["Objective_Function_Value"])
+
+    # the lazy schedule is feasible for the full model: in room-day order, by precedence, within s[k, t]
+    for (k, t), patients in lazyPlanner.extract_solution().items():
+        patients = sorted(patients, key=lambda patient: patient.order)
+        for first, second in zip(patients, patients[1:]):
+            assert first.precedence <= second.precedence
+            assert first.order + first.operatingTime <= second.order
+        if(len(patients) > 0):
+            assert patients[-1].order + patients[-1].operatingTime <= instance.operatingRoomTimes[k - 1, t - 1]
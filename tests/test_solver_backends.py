@@ -0,0 +1,34 @@
+import pyomo.environ as pyo
+import pytest
+
+from data_maker import DataMaker
+from planners import SinglePhaseStartingMinutePlanner
+from sweep import DEFAULT_GRID, create_data_descriptor
+
+
+def solver_param(solver):
+    available = pyo.SolverFactory(solver).available(exception_flag=False)
+    return pytest.param(solver, marks=pytest.mark.skipif(not available, reason=solver + " is not installed"))
+
+
+# re-solving a loaded model after r, d and s change in place must give what solving the new data from scratch gives
+@pytest.mark.parametrize("solver", [solver_param("cplex_persistent"), solver_param("gurobi_persistent"), solver_param("appsi_highs")])
+def test_resolve_after_data_change_matches_cold_solve(solver):
+    dataDescriptor = create_data_descriptor({"patients": 16, "covid": 0.5, "delayWeight": 0.25}, DEFAULT_GRID["dataDescriptor"])
+    dataMaker = DataMaker(seed=7)
+    arrays = dataMaker.draw_instance_arrays(dataDescriptor, "UO")
+    planner = SinglePhaseStartingMinutePlanner(timeLimit=60, gap=0, solver=solver)
+    planner.solve_model(dataMaker.create_instance_from_arrays(arrays, 0.25))
+
+    # d changes with the delay weight, r and s by hand
+    changed = dataMaker.create_instance_from_arrays(arrays, 0.75)
+    changed.priorities[:4] = changed.priorities[:4] * 2
+    changed.operatingRoomTimes[0, 0] = 200
+    resolveRunInfo = planner.resolve_model(changed)
+    coldRunInfo = SinglePhaseStartingMinutePlanner(timeLimit=60, gap=0, solver=solver).solve_model(changed)
+
+    assert resolveRunInfo["Parametric"]
+    assert resolveRunInfo["Optimal"] and coldRunInfo["Optimal"]
+    assert resolveRunInfo["Objective_Function_Value"] == pytest.approx(coldRunInfo["Objective_Function_Value"])
+    for (k, t), patients in planner.extract_solution().items():
+        assert sum(patient.operatingTime for patient in patients) <= changed.operatingRoomTimes[k - 1, t - 1]
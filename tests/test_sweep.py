@@ -0,0 +1,32 @@
+import os
+
+from results_store import ResultsStore
+from sweep import create_cells, delay_weight_columns, render_schedules, shard_cells
+
+
+def store_cell(testId, solver):
+    return {"testId": testId, "solver": solver, "patients": 2, "covid": 0.5, "delayEstimate": "UO", "delayWeight": 0.5}
+
+
+def test_render_schedules_skips_empty_runs(tmp_path):
+    resultsFile = str(tmp_path / "results.db")
+    with ResultsStore(resultsFile) as store:
+        store.add_run(store_cell("T_1", "cbc"), {}, 1, 10, 2, [2, 0, 0, 0],
+                      schedule=[(1, 1, 1, 0, 60, 5, 1, 0, 1), (2, 1, 2, 0, 90, 5, 1, 0, 1)])
+        # nothing scheduled and no room-day rows, as in stores written before room_days existed
+        store.add_run(store_cell("T_2", "cbc"), {}, 1, 0, 0, [0, 0, 0, 0])
+
+    paths = render_schedules(resultsFile, str(tmp_path / "gantt"), workers=1)
+    assert [os.path.basename(path) for path in paths] == ["T_1_cbc.html"]
+    assert os.path.exists(paths[0])
+
+
+def test_parametric_shards_keep_delay_weight_columns_together():
+    cells = create_cells(["cbc", "cplex"], ["UO", "procedure"], [0.25, 0.5, 0.75], [20, 40], [0.0, 0.5])
+    shards = [shard_cells(cells, shard, 3, parametric=True) for shard in range(1, 4)]
+
+    assert sorted(cell["testId"] + cell["solver"] for shard in shards for cell in shard) == sorted(cell["testId"] + cell["solver"] for cell in cells)
+    for shard in shards:
+        for column in delay_weight_columns(shard):
+            # the whole column, every delay weight of it, on this shard
+            assert [cell["delayWeight"] for cell in column] == [0.25, 0.5, 0.75]